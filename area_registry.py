@@ -0,0 +1,73 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Area
+
+# 다른 프로세스에서 추가된 Area 를 반영하기 위한 주기적 reload (second)
+AREA_REGISTRY_TTL = getattr(settings, 'AREA_REGISTRY_TTL', 60 * 60)
+
+
+class AreaRegistry:
+    def __init__(self, ttl=AREA_REGISTRY_TTL):
+        self.ttl = ttl
+        self._areas = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._areas is None or time.time() - self._loaded_at > self.ttl:
+            self.reload()
+
+    def reload(self):
+        areas = {area.code: area for area in Area.objects.all()}
+        with self._lock:
+            self._areas = areas
+            self._loaded_at = time.time()
+
+    def get(self, code):
+        self._ensure_loaded()
+        return self._areas.get(str(code))
+
+    def resolve(self, locate):
+        # location() 결과 dict 를 Area 로 변환, 없는 지역만 DB 에 생성
+        code = str(locate['adm_cd'])
+        area = self.get(code)
+        if area is not None:
+            return area
+        area, created = Area.objects.get_or_create(
+            code=code,
+            defaults={
+                'unit1': locate['sido_nm'],
+                'unit2': locate['sgg_nm'],
+                'unit3': locate['emdong_nm'],
+            }
+        )
+        self.put(area)
+        return area
+
+    def put(self, area):
+        with self._lock:
+            if self._areas is not None:
+                self._areas[area.code] = area
+
+    def discard(self, code):
+        with self._lock:
+            if self._areas is not None:
+                self._areas.pop(code, None)
+
+
+area_registry = AreaRegistry()
+
+
+@receiver(post_save, sender=Area)
+def area_saved(sender, instance, **kwargs):
+    area_registry.put(instance)
+
+
+@receiver(post_delete, sender=Area)
+def area_deleted(sender, instance, **kwargs):
+    area_registry.discard(instance.code)
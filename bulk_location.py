@@ -0,0 +1,97 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .area_registry import area_registry
+from .geocode_cache import geocode_cache
+from .geocoder import reverse_geocode
+from .location import SGIS_FALLBACK, to_utmk_many, sgis_location_utmk
+from .models import Profile
+
+BULK_LOCATION_WORKERS = getattr(settings, 'BULK_LOCATION_WORKERS', 8)
+BULK_LOCATION_BATCH_SIZE = getattr(settings, 'BULK_LOCATION_BATCH_SIZE', 500)
+
+logger = logging.getLogger(__name__)
+
+
+def _safe_sgis_location(x, y):
+    # 좌표 하나의 실패(timeout, 응답 파싱 오류, 빈 result 등)가 batch 전체를 멈추지 않도록
+    try:
+        return sgis_location_utmk(x, y)
+    except Exception as e:
+        logger.warning('sgis location failed for (%s, %s): %r', x, y, e)
+        return None
+
+
+def _resolve_remote(points, workers):
+    # 로컬/캐시에서 못찾은 좌표만 한번에 UTM-K 로 변환 후 SGIS 를 동시에 호출
+    if not points or not SGIS_FALLBACK:
+        return {}
+    keys = list(points.keys())
+    xs, ys = to_utmk_many([points[k][0] for k in keys], [points[k][1] for k in keys])
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_safe_sgis_location, xs, ys)
+        return dict(zip(keys, results))
+
+
+def bulk_update_locations(items, workers=BULK_LOCATION_WORKERS, batch_size=BULK_LOCATION_BATCH_SIZE):
+    # items: [{'owner': username, 'lng': .., 'lat': ..}, ...]
+    started = time.time()
+    stats = {'total': 0, 'resolved': 0, 'failed': 0, 'updated': 0}
+
+    # 같은 버킷의 좌표는 한번만 조회
+    owner_keys = {}
+    locates = {}
+    remote = {}
+    for item in items:
+        stats['total'] += 1
+        try:
+            owner = item['owner']
+            lng, lat = float(item['lng']), float(item['lat'])
+        except (KeyError, TypeError, ValueError):
+            stats['failed'] += 1
+            continue
+        key = geocode_cache.bucket(lng, lat)
+        owner_keys[owner] = key
+        if key in locates or key in remote:
+            continue
+        locate = geocode_cache.get(key) or reverse_geocode(lng, lat)
+        if locate is not None:
+            locates[key] = locate
+        else:
+            remote[key] = (lng, lat)
+
+    # dict 가 아닌 결과(실패)는 locates 에 넣지 않아서 아래에서 owner 별로 failed 로 센다
+    for key, locate in _resolve_remote(remote, workers).items():
+        if isinstance(locate, dict):
+            locates[key] = locate
+    for key, locate in locates.items():
+        geocode_cache.set(key, locate)
+
+    area_ids = {}
+    for key, locate in locates.items():
+        area_ids[key] = area_registry.resolve(locate).id
+
+    updates = []
+    for owner, key in owner_keys.items():
+        if key not in area_ids:
+            stats['failed'] += 1
+            continue
+        updates.append((owner, area_ids[key]))
+    stats['resolved'] = len(updates)
+
+    for i in range(0, len(updates), batch_size):
+        chunk = dict(updates[i:i + batch_size])
+        profiles = list(Profile.objects.filter(owner__username__in=chunk.keys())
+                        .select_related('owner').only('id', 'area', 'owner__username'))
+        for profile in profiles:
+            profile.area_id = chunk[profile.owner.username]
+        Profile.objects.bulk_update(profiles, ['area'])
+        stats['updated'] += len(profiles)
+
+    elapsed = time.time() - started
+    stats['elapsed'] = round(elapsed, 3)
+    stats['per_second'] = round(stats['total'] / elapsed, 1) if elapsed else None
+    return stats
@@ -0,0 +1,234 @@
+import gzip
+import json
+import logging
+import os
+import shutil
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.settings import api_settings
+
+from .models import ChatRoom, ChatMessage, ChatArchiveSegment
+from .response_handler import CommonResponse, ResponseConstants, cursor_paginator, encode_cursor, decode_cursor, \
+    rows_validators, not_modified
+
+CHAT_ARCHIVE_DIR = getattr(settings, 'CHAT_ARCHIVE_DIR',
+                           os.path.join(str(getattr(settings, 'BASE_DIR', '.')), 'chat_archive'))
+CHAT_ARCHIVE_AGE_DAYS = getattr(settings, 'CHAT_ARCHIVE_AGE_DAYS', 180)
+CHAT_ARCHIVE_BATCH_SIZE = getattr(settings, 'CHAT_ARCHIVE_BATCH_SIZE', 1000)
+
+logger = logging.getLogger(__name__)
+
+
+def segment_path(room_id, month):
+    return os.path.join(CHAT_ARCHIVE_DIR, str(room_id % 256), str(room_id), f'{month}.jsonl.gz')
+
+
+def _to_row(message):
+    return {
+        'id': message.id,
+        'room_id': message.room_id,
+        'sender_id': message.sender_id,
+        'num': message.num,
+        'content': message.content,
+        'readers': message.readers,
+        'created_time': message.created_time.isoformat(),
+        'modified_time': message.modified_time.isoformat(),
+    }
+
+
+def _from_row(row):
+    row = dict(row)
+    row['created_time'] = parse_datetime(row['created_time'])
+    row['modified_time'] = parse_datetime(row['modified_time'])
+    return ChatMessage(**row)
+
+
+def _append_segment(room_id, month, messages):
+    segment, created = ChatArchiveSegment.objects.get_or_create(
+        room_id=room_id, month=month,
+        defaults={'path': segment_path(room_id, month), 'first_id': messages[0].id, 'last_id': 0}
+    )
+    # 파일에 쓰고 DB 에서 지우기 전에 죽었다면 다시 돌릴 때 이미 쓴 메시지는 건너뛴다
+    # 파일에 쓰고 last_id 를 기록하기 전에 죽었다면 같은 row 가 다시 붙는다. 읽을 때 id 로 걸러낸다
+    messages = [m for m in messages if m.id > segment.last_id]
+    if not messages:
+        return
+    _write_segment(segment.path, [_to_row(message) for message in messages])
+    ChatArchiveSegment.objects.filter(id=segment.id).update(
+        last_id=messages[-1].id, count=segment.count + len(messages), modified_time=timezone.now()
+    )
+
+
+def _write_segment(path, rows):
+    # 기존 파일 + 새 gzip member 를 임시 파일에 쓰고 rename 한다. 중간에 죽어도 원래 파일은 온전하다
+    # gzip 은 member 를 이어붙여도 하나의 스트림으로 읽힌다
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as out:
+        if os.path.exists(path):
+            existing, intact = _read_rows(path)
+            if intact:
+                with open(path, 'rb') as f:
+                    shutil.copyfileobj(f, out)
+            else:
+                # 끝이 잘린 파일 뒤에 붙이면 새 row 도 읽히지 않으므로 읽을 수 있는 row 로 다시 쓴다
+                rows = existing + [row for row in rows if not existing or row['id'] > existing[-1]['id']]
+        with gzip.open(out, 'wt', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, path)
+
+
+def archive_batch(cutoff, batch_size=CHAT_ARCHIVE_BATCH_SIZE):
+    # cutoff 이전 메시지 batch_size 개를 파일로 옮기고 지운다. 옮긴 개수를 돌려준다
+    # 방의 last_message 로 쓰이는 메시지는 남겨둔다
+    last_message_ids = ChatRoom.objects.filter(last_message__isnull=False).values('last_message_id')
+    messages = list(ChatMessage.objects.filter(created_time__lt=cutoff)
+                    .exclude(id__in=last_message_ids).order_by('id')[:batch_size])
+    if not messages:
+        return 0
+    groups = {}
+    for message in messages:
+        key = (message.room_id, message.created_time.strftime('%Y-%m'))
+        groups.setdefault(key, []).append(message)
+    for (room_id, month), group in groups.items():
+        _append_segment(room_id, month, group)
+    # 짧은 트랜잭션으로 batch 단위 삭제
+    with transaction.atomic():
+        ChatMessage.objects.filter(id__in=[m.id for m in messages]).delete()
+    return len(messages)
+
+
+def archive_older_than(days=CHAT_ARCHIVE_AGE_DAYS, batch_size=CHAT_ARCHIVE_BATCH_SIZE, progress=None):
+    cutoff = timezone.now() - timedelta(days=days)
+    total = 0
+    while True:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            return total
+        total += moved
+        if progress:
+            progress(total)
+
+
+def archived_until(room_id):
+    # 이 방에서 아카이브된 마지막 메시지 id, 없으면 0
+    return ChatArchiveSegment.objects.filter(room_id=room_id).aggregate(last_id=Max('last_id'))['last_id'] or 0
+
+
+def read_archived(room_id, after_id=0, limit=None):
+    # after_id 이후 아카이브된 메시지를 id 순으로 (저장되지 않은 ChatMessage 인스턴스)
+    rows = []
+    segments = ChatArchiveSegment.objects.filter(room_id=room_id, last_id__gt=after_id).order_by('first_id')
+    for segment in segments:
+        for row in _read_segment(segment):
+            if row['id'] <= after_id:
+                continue
+            after_id = row['id']
+            rows.append(_from_row(row))
+            if limit is not None and len(rows) >= limit:
+                return rows
+    return rows
+
+
+def _read_rows(path):
+    # (rows, 끝까지 온전히 읽었는지)
+    # row 는 id 순으로 붙으므로 이미 나온 id 이하가 다시 나오면 중복으로 보고 건너뛴다
+    rows = []
+    last_id = 0
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                if row['id'] > last_id:
+                    rows.append(row)
+                    last_id = row['id']
+    except (EOFError, OSError, zlib.error, ValueError) as e:
+        # 쓰다 죽어서 끝이 잘린 파일은 읽을 수 있는 데까지만 쓴다
+        logger.warning('chat archive segment %s is truncated after id %s: %r', path, last_id, e)
+        return rows, False
+    return rows, True
+
+
+def _read_segment(segment):
+    if not os.path.exists(segment.path):
+        return []
+    return _read_rows(segment.path)[0]
+
+
+def read_archived_before(room_id, before_id, limit):
+    # before_id 직전의 아카이브 메시지 limit 개를 id 순으로
+    rows = []
+    segments = ChatArchiveSegment.objects.filter(room_id=room_id, first_id__lt=before_id).order_by('-first_id')
+    for segment in segments:
+        older = [_from_row(row) for row in _read_segment(segment) if row['id'] < before_id]
+        if older:
+            before_id = older[0].id
+        rows = older + rows
+        if len(rows) >= limit:
+            return rows[-limit:]
+    return rows
+
+
+def archive_paginator(request, room_id, serializer):
+    # 아카이브가 있는 방은 파일 + DB 를 id 순으로 이어서 읽는다. 커서 형식은 cursor_paginator 와 같다
+    queryset = ChatMessage.objects.filter(room_id=room_id)
+    if not archived_until(room_id):
+        return cursor_paginator(request, queryset, serializer, descending=False)
+
+    base_url = request.build_absolute_uri().split('?')[0]
+    page_size = api_settings.PAGE_SIZE
+    cursor = request.query_params.get('cursor')
+    pk, reverse = 0, False
+    if cursor:
+        try:
+            _, pk, reverse = decode_cursor(cursor)
+        except (ValueError, KeyError, TypeError):
+            return CommonResponse(status.HTTP_404_NOT_FOUND, "유효하지 않은 커서입니다.",
+                                  {'detail': 'Invalid cursor.'})
+
+    if reverse:
+        rows = list(queryset.filter(id__lt=pk).order_by('-id')[:page_size + 1])[::-1]
+        if len(rows) <= page_size:
+            before_id = rows[0].id if rows else pk
+            rows = read_archived_before(room_id, before_id, page_size + 1 - len(rows)) + rows
+        has_more = len(rows) > page_size
+        rows = rows[-page_size:]
+    else:
+        rows = read_archived(room_id, pk, page_size + 1)
+        if len(rows) <= page_size:
+            after_id = rows[-1].id if rows else pk
+            rows += list(queryset.filter(id__gt=after_id).order_by('id')[:page_size + 1 - len(rows)])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+    prev_page = None
+    next_page = None
+    if rows:
+        first, last = rows[0], rows[-1]
+        if (has_more if reverse else bool(cursor)):
+            prev_page = '{}?cursor={}'.format(base_url, encode_cursor(first.created_time, first.id, True))
+        if (bool(cursor) if reverse else has_more):
+            next_page = '{}?cursor={}'.format(base_url, encode_cursor(last.created_time, last.id))
+
+    etag, last_modified = rows_validators(request, rows, prev_page, next_page)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+
+    result = {
+        'previous': prev_page,
+        'next': next_page,
+        'results': serializer(rows, many=True, context={'request': request}).data
+    }
+    return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, result, etag=etag,
+                          last_modified=last_modified)
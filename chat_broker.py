@@ -0,0 +1,69 @@
+import queue
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import ChatMessage
+
+# 다른 pub/sub (redis 등) 을 쓰려면 subscribe/unsubscribe/publish 를 가진 클래스 경로를 지정
+CHAT_BROKER = getattr(settings, 'CHAT_BROKER', 'api.chat_broker.InMemoryBroker')
+CHAT_SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+class InMemoryBroker:
+    # 같은 프로세스 안의 구독자에게만 전달된다. 테스트나 단일 프로세스 배포용
+    # 워커가 여러 프로세스/서버면 다른 워커에 붙은 구독자는 메시지를 못 받는다 (재접속 때 since 로만 받음)
+    # 이 경우 CHAT_BROKER 에 redis pub/sub 같은 프로세스 간 broker 를 지정해야 한다
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, room_id):
+        q = queue.Queue(maxsize=CHAT_SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[room_id].add(q)
+        return q
+
+    def unsubscribe(self, room_id, q):
+        with self._lock:
+            subscribers = self._subscribers.get(room_id)
+            if subscribers is not None:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[room_id]
+
+    def publish(self, room_id, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(room_id, ()))
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # 느린 구독자는 재접속할 때 since 로 빠진 메시지를 받는다
+                pass
+
+
+broker = import_string(CHAT_BROKER)()
+
+
+def message_payload(message):
+    return {
+        'id': message.id,
+        'room': message.room_id,
+        'num': message.num,
+        'sender': message.sender_id,
+        'content': message.content,
+        'created_time': message.created_time,
+    }
+
+
+@receiver(post_save, sender=ChatMessage)
+def chat_message_saved(sender, instance, created, **kwargs):
+    if created:
+        payload = message_payload(instance)
+        transaction.on_commit(lambda: broker.publish(instance.room_id, payload))
@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .chat_broker import broker, message_payload
+from .models import ChatRoom, ChatMessage
+
+CHAT_ROOM_CACHE_SIZE = getattr(settings, 'CHAT_ROOM_CACHE_SIZE', 10000)
+CHAT_BATCH_MAX = getattr(settings, 'CHAT_BATCH_MAX', 500)
+
+
+def rooms_of(profile):
+    return ChatRoom.objects.filter(Q(seller=profile) | Q(buyer=profile))
+
+
+def sync_rooms(profile, since=0):
+    # since(클라이언트가 마지막으로 받은 메시지 id) 이후 새 메시지가 있는 방만, 쿼리 한번으로
+    # unread 는 방의 last_num 과 참여자의 *_last_num 차이라서 메시지 테이블을 보지 않는다
+    rooms = list(rooms_of(profile).filter(last_message_id__gt=since)
+                 .select_related('last_message').order_by('last_message_id'))
+    watermark = rooms[-1].last_message_id if rooms else since
+    return rooms, watermark
+
+
+def mark_read(room, profile, num):
+    # 읽은 위치는 앞으로만 움직인다
+    num = min(int(num), room.last_num)
+    field = 'seller_last_num' if room.seller_id == profile.id else 'buyer_last_num'
+    ChatRoom.objects.filter(id=room.id).update(**{field: Greatest(field, num), 'modified_time': timezone.now()})
+    return num
+
+
+class RoomParticipants:
+    # room_id -> (seller_id, buyer_id) LRU 캐시, 메시지마다 ChatRoom 을 조회하지 않도록
+    def __init__(self, maxsize=CHAT_ROOM_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, room_id):
+        with self._lock:
+            if room_id in self._data:
+                self._data.move_to_end(room_id)
+                return self._data[room_id]
+        participants = ChatRoom.objects.filter(id=room_id).values_list('seller_id', 'buyer_id').first()
+        if participants is not None:
+            with self._lock:
+                self._data[room_id] = participants
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return participants
+
+    def is_member(self, room_id, profile_id):
+        participants = self.get(room_id)
+        return participants is not None and profile_id in participants
+
+    def discard(self, room_id):
+        with self._lock:
+            self._data.pop(room_id, None)
+
+
+room_participants = RoomParticipants()
+
+
+@receiver(post_save, sender=ChatRoom)
+@receiver(post_delete, sender=ChatRoom)
+def chat_room_changed(sender, instance, **kwargs):
+    room_participants.discard(instance.id)
+
+
+@transaction.atomic
+def append_messages(sender, items):
+    # items: [(room_id, content), ...] 를 bulk_create 한번으로 저장
+    # 방마다 last_num 을 한꺼번에 올려서 num 구간을 확보하고, 마지막 메시지와 modified_time 을 같이 갱신한다
+    by_room = {}
+    for room_id, content in items:
+        by_room.setdefault(room_id, []).append(content)
+
+    messages = []
+    ranges = {}
+    # 여러 방을 잠글 때 순서를 고정해서 deadlock 을 피한다
+    for room_id in sorted(by_room):
+        contents = by_room[room_id]
+        ChatRoom.objects.filter(id=room_id).update(last_num=F('last_num') + len(contents))
+        last_num = ChatRoom.objects.filter(id=room_id).values_list('last_num', flat=True).get()
+        start = last_num - len(contents)
+        ranges[room_id] = (start, last_num)
+        for i, content in enumerate(contents, 1):
+            messages.append(ChatMessage(room_id=room_id, sender=sender, num=start + i, content=content, readers=''))
+    ChatMessage.objects.bulk_create(messages)
+
+    # MySQL 은 bulk_create 후 pk 를 돌려주지 않아서 (room, num) 으로 다시 읽는다
+    query = Q()
+    for room_id, (start, last_num) in ranges.items():
+        query |= Q(room_id=room_id, num__gt=start, num__lte=last_num)
+    saved = list(ChatMessage.objects.filter(query).order_by('id'))
+    now = timezone.now()
+    for room_id, (start, last_num) in ranges.items():
+        last = next(m for m in reversed(saved) if m.room_id == room_id)
+        ChatRoom.objects.filter(id=room_id).update(last_message_id=last.id, modified_time=now)
+
+    # bulk_create 는 post_save 를 보내지 않으므로 직접 push
+    payloads = [message_payload(m) for m in saved]
+
+    def publish():
+        for payload in payloads:
+            broker.publish(payload['room'], payload)
+
+    transaction.on_commit(publish)
+    return saved
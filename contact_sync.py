@@ -0,0 +1,87 @@
+import json
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import Profile, RelationShip
+from .phone import normalize_phone_number, to_e164
+from .reachability import contact_import_affected, enqueue_rebuild
+
+CONTACT_SYNC_BATCH_SIZE = getattr(settings, 'CONTACT_SYNC_BATCH_SIZE', 1000)
+
+
+def parse_list(value):
+    # JSON 배열 또는 예전 클라이언트의 "['010..', '010..']" 문자열
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    try:
+        parsed = json.loads(value)
+        if isinstance(parsed, list):
+            return parsed
+    except ValueError:
+        pass
+    value = value.strip().lstrip('[').rstrip(']')
+    return [item.strip().strip('\'"') for item in value.split(',') if item.strip()]
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _create_profiles(numbers, batch_size):
+    # MySQL 은 bulk_create 후 pk 를 돌려주지 않아서 username 으로 다시 조회한다
+    created = {}
+    for chunk in _chunks(numbers, batch_size):
+        usernames = {str(uuid4()): number for number in chunk}
+        User.objects.bulk_create([User(username=username) for username in usernames])
+        owners = User.objects.filter(username__in=list(usernames)).values_list('id', 'username')
+        owner_numbers = {owner_id: usernames[username] for owner_id, username in owners}
+        Profile.objects.bulk_create([
+            Profile(owner_id=owner_id, phone_number=number, phone_key=to_e164(number))
+            for owner_id, number in owner_numbers.items()
+        ])
+        for profile_id, owner_id in Profile.objects.filter(owner_id__in=list(owner_numbers)) \
+                .values_list('id', 'owner_id'):
+            created[owner_numbers[owner_id]] = profile_id
+    return created
+
+
+@transaction.atomic
+def sync_contacts(subject, numbers, names, batch_size=CONTACT_SYNC_BATCH_SIZE):
+    contacts = {}
+    for number, name in zip(numbers, names):
+        number = normalize_phone_number(number)
+        if number and number not in contacts:
+            contacts[number] = str(name)[:100]
+
+    # 이미 있는 번호는 앱 사용자를 우선으로 연결 (phone_key 는 E.164 로 정규화된 인덱스 컬럼)
+    existing = {}
+    for chunk in _chunks(list(contacts), batch_size):
+        keys = {to_e164(number): number for number in chunk}
+        for phone_key, profile_id in Profile.objects.filter(phone_key__in=list(keys)) \
+                .order_by('-is_app_user', 'id').values_list('phone_key', 'id'):
+            existing.setdefault(keys[phone_key], profile_id)
+
+    missing = [number for number in contacts if number not in existing]
+    created = _create_profiles(missing, batch_size)
+    existing.update(created)
+
+    relations = [
+        RelationShip(subject=subject, object_id=existing[number], object_name=name)
+        for number, name in contacts.items()
+        if number in existing and existing[number] != subject.id
+    ]
+    RelationShip.objects.bulk_create(relations, batch_size=batch_size, ignore_conflicts=True)
+    # bulk_create 는 signal 을 보내지 않는다. 대량 import 는 요청 안에서 다시 계산하지 않고 큐에 넣는다
+    # 방금 만든 비회원 profile 은 subject 말고는 가진 사람이 없으므로 기존 profile 만 본다
+    created_ids = set(created.values())
+    enqueue_rebuild(contact_import_affected(
+        subject, [relation.object_id for relation in relations if relation.object_id not in created_ids],
+        batch_size,
+    ), batch_size)
+    return {'contacts': len(contacts), 'created': len(created), 'linked': len(relations)}
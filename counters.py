@@ -0,0 +1,80 @@
+from django.db.models import F, Case, When, Value, FloatField, IntegerField, Count, Sum, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Profile, Product, Recommend, Evaluation, ChatRoom
+
+# 모든 갱신은 F() 로 DB 에서 계산해서 동시 요청에도 값이 틀어지지 않게 한다.
+# 호출하는 view 를 transaction.atomic 으로 감싸면 원본 row 와 같은 트랜잭션에서 반영된다.
+
+MEAN_SCORE = Case(
+    When(review_count__gt=0, then=Cast(F('score_sum'), FloatField()) / F('review_count')),
+    default=Value(0.0),
+    output_field=FloatField(),
+)
+
+
+def _add_review(profile_id, score, sign):
+    Profile.objects.filter(id=profile_id).update(
+        review_count=F('review_count') + sign,
+        score_sum=F('score_sum') + sign * score,
+    )
+    # DB 마다 SET 절 평가 순서가 달라서 평균은 별도 UPDATE 로 계산
+    Profile.objects.filter(id=profile_id).update(score=MEAN_SCORE)
+
+
+@receiver(post_save, sender=Recommend)
+def recommend_saved(sender, instance, created, **kwargs):
+    if created:
+        Profile.objects.filter(id=instance.object_id).update(recommend_count=F('recommend_count') + 1)
+
+
+@receiver(post_delete, sender=Recommend)
+def recommend_deleted(sender, instance, **kwargs):
+    Profile.objects.filter(id=instance.object_id).update(recommend_count=F('recommend_count') - 1)
+
+
+@receiver(post_save, sender=Evaluation)
+def evaluation_saved(sender, instance, created, **kwargs):
+    if created:
+        _add_review(instance.object_id, int(instance.score), 1)
+
+
+@receiver(post_delete, sender=Evaluation)
+def evaluation_deleted(sender, instance, **kwargs):
+    _add_review(instance.object_id, int(instance.score), -1)
+
+
+@receiver(post_save, sender=ChatRoom)
+def chat_room_saved(sender, instance, created, **kwargs):
+    if created and instance.product_id:
+        Product.objects.filter(id=instance.product_id).update(chat_count=F('chat_count') + 1)
+
+
+@receiver(post_delete, sender=ChatRoom)
+def chat_room_deleted(sender, instance, **kwargs):
+    if instance.product_id:
+        Product.objects.filter(id=instance.product_id).update(chat_count=F('chat_count') - 1)
+
+
+def increment_read_count(product_id, amount=1):
+    Product.objects.filter(id=product_id).update(read_count=F('read_count') + amount)
+
+
+def _subquery(model, field, aggregate):
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field) \
+        .annotate(value=aggregate).values('value')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+
+def reconcile():
+    # 어긋난 비정규화 값을 원본 테이블 기준으로 다시 계산
+    profiles = Profile.objects.update(
+        recommend_count=_subquery(Recommend, 'object', Count('id')),
+        review_count=_subquery(Evaluation, 'object', Count('id')),
+        score_sum=_subquery(Evaluation, 'object', Sum('score')),
+    )
+    Profile.objects.update(score=MEAN_SCORE)
+    products = Product.objects.update(chat_count=_subquery(ChatRoom, 'product', Count('id')))
+    return {'profiles': profiles, 'products': products}
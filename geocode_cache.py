@@ -0,0 +1,109 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .location import location
+
+GEOCODE_CACHE_GRID = getattr(settings, 'GEOCODE_CACHE_GRID', 50)  # meter
+GEOCODE_CACHE_SIZE = getattr(settings, 'GEOCODE_CACHE_SIZE', 10000)
+GEOCODE_CACHE_TTL = getattr(settings, 'GEOCODE_CACHE_TTL', 60 * 60 * 24)  # second
+# settings.CACHES 의 alias, 지정하면 프로세스간 공유 캐시도 사용
+GEOCODE_CACHE_ALIAS = getattr(settings, 'GEOCODE_CACHE_ALIAS', None)
+
+METERS_PER_DEGREE = 111320
+
+
+class GeocodeCache:
+    def __init__(self, grid=GEOCODE_CACHE_GRID, maxsize=GEOCODE_CACHE_SIZE, ttl=GEOCODE_CACHE_TTL,
+                 alias=GEOCODE_CACHE_ALIAS):
+        self.grid = grid
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.alias = alias
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def bucket(self, lng, lat):
+        lat_step = self.grid / METERS_PER_DEGREE
+        lat_idx = int(math.floor(lat / lat_step))
+        # 경도 1도의 거리는 위도에 따라 줄어들기 때문에 버킷 중심 위도로 보정
+        center_lat = (lat_idx + 0.5) * lat_step
+        lng_step = lat_step / max(math.cos(math.radians(center_lat)), 0.01)
+        lng_idx = int(math.floor(lng / lng_step))
+        return f'geocode:{self.grid}:{lng_idx}:{lat_idx}'
+
+    def _shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at = item
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+        shared = self._shared()
+        if shared is not None:
+            value = shared.get(key)
+            if value is not None:
+                self._set_local(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _set_local(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.time() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def set(self, key, value):
+        self._set_local(key, value)
+        shared = self._shared()
+        if shared is not None:
+            shared.set(key, value, self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.shared_hits + self.misses
+            return {
+                'size': len(self._data),
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.shared_hits) / total if total else 0.0,
+            }
+
+
+geocode_cache = GeocodeCache()
+
+
+def cached_location(lng, lat):
+    key = geocode_cache.bucket(float(lng), float(lat))
+    result = geocode_cache.get(key)
+    if result is not None:
+        return dict(result)
+    result = location(lng, lat)
+    # 실패 응답(tuple)은 캐시하지 않는다
+    if isinstance(result, dict):
+        geocode_cache.set(key, result)
+    return result
@@ -0,0 +1,115 @@
+import json
+import threading
+
+from django.conf import settings
+
+# 읍면동 경계 GeoJSON (WGS84). feature.properties 에 adm_cd, sido_nm, sgg_nm, emdong_nm 이 있어야 한다.
+EMDONG_BOUNDARY_PATH = getattr(settings, 'EMDONG_BOUNDARY_PATH', None)
+GRID_CELL_SIZE = getattr(settings, 'EMDONG_GRID_CELL_SIZE', 0.01)  # degree, 약 1km
+
+
+def _point_in_ring(x, y, ring):
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i][0], ring[i][1]
+        xj, yj = ring[j][0], ring[j][1]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def _point_in_polygon(x, y, polygon):
+    # polygon = [outer, hole1, hole2, ...]
+    if not _point_in_ring(x, y, polygon[0]):
+        return False
+    for hole in polygon[1:]:
+        if _point_in_ring(x, y, hole):
+            return False
+    return True
+
+
+class Region:
+    __slots__ = ('info', 'polygons', 'bbox')
+
+    def __init__(self, info, polygons):
+        self.info = info
+        self.polygons = polygons
+        xs = [p[0] for polygon in polygons for p in polygon[0]]
+        ys = [p[1] for polygon in polygons for p in polygon[0]]
+        self.bbox = (min(xs), min(ys), max(xs), max(ys))
+
+    def contains(self, x, y):
+        min_x, min_y, max_x, max_y = self.bbox
+        if x < min_x or x > max_x or y < min_y or y > max_y:
+            return False
+        for polygon in self.polygons:
+            if _point_in_polygon(x, y, polygon):
+                return True
+        return False
+
+
+class LocalGeocoder:
+    def __init__(self, regions, cell_size=GRID_CELL_SIZE):
+        self.regions = regions
+        self.cell_size = cell_size
+        self.grid = {}
+        for idx, region in enumerate(regions):
+            min_x, min_y, max_x, max_y = region.bbox
+            for cx in range(self._cell(min_x), self._cell(max_x) + 1):
+                for cy in range(self._cell(min_y), self._cell(max_y) + 1):
+                    self.grid.setdefault((cx, cy), []).append(idx)
+
+    def _cell(self, v):
+        return int(v // self.cell_size)
+
+    @classmethod
+    def from_geojson(cls, path, cell_size=GRID_CELL_SIZE):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        regions = []
+        for feature in data['features']:
+            geometry = feature['geometry']
+            if geometry['type'] == 'Polygon':
+                polygons = [geometry['coordinates']]
+            elif geometry['type'] == 'MultiPolygon':
+                polygons = geometry['coordinates']
+            else:
+                continue
+            props = feature['properties']
+            info = {
+                'adm_cd': str(props['adm_cd']),
+                'sido_nm': props['sido_nm'],
+                'sgg_nm': props['sgg_nm'].replace(' ', ''),
+                'emdong_nm': props['emdong_nm'],
+            }
+            regions.append(Region(info, polygons))
+        return cls(regions, cell_size)
+
+    def lookup(self, lng, lat):
+        for idx in self.grid.get((self._cell(lng), self._cell(lat)), ()):
+            region = self.regions[idx]
+            if region.contains(lng, lat):
+                return dict(region.info)
+        return None
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    global _geocoder
+    if _geocoder is None and EMDONG_BOUNDARY_PATH:
+        with _geocoder_lock:
+            if _geocoder is None:
+                _geocoder = LocalGeocoder.from_geojson(EMDONG_BOUNDARY_PATH)
+    return _geocoder
+
+
+def reverse_geocode(lng, lat):
+    geocoder = get_geocoder()
+    if geocoder is None:
+        return None
+    return geocoder.lookup(float(lng), float(lat))
@@ -1,43 +1,152 @@
 import json
-from pyproj import Proj, transform
+import threading
+import time
+
+from django.conf import settings
+from pyproj import Transformer
 import requests
+from requests.adapters import HTTPAdapter
+
+from .geocoder import reverse_geocode
+
+SGIS_API_URL = getattr(settings, 'SGIS_API_URL', 'https://sgisapi.kostat.go.kr/OpenAPI3')
+SGIS_TIMEOUT = getattr(settings, 'SGIS_TIMEOUT', (3, 5))  # (connect, read)
+SGIS_TOKEN_LEEWAY = 60  # 만료 60초 전에 미리 갱신
+SGIS_TOKEN_DEFAULT_TTL = 60 * 60 * 4  # accessTimeout 이 없을 때 사용
+SGIS_TOKEN_EXPIRED_CODE = -401
+# 로컬 경계 데이터에서 못찾은 경우에만 SGIS 를 호출
+SGIS_FALLBACK = getattr(settings, 'SGIS_FALLBACK', True)
+
+
+def _make_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=getattr(settings, 'SGIS_POOL_SIZE', 10))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# 프로세스 단위로 keep-alive 커넥션을 재사용
+session = _make_session()
+
+
+_transformer = None
+_transformer_lock = threading.Lock()
+
+
+def get_transformer():
+    # CRS 데이터베이스 조회가 무거워서 프로세스당 한번만 생성 (pyproj>=3.1 은 thread-safe)
+    global _transformer
+    if _transformer is None:
+        with _transformer_lock:
+            if _transformer is None:
+                _transformer = Transformer.from_crs('EPSG:4326', 'EPSG:5178', always_xy=True)
+    return _transformer
+
+
+def to_utmk(lng, lat):
+    return get_transformer().transform(lng, lat)
+
+
+def to_utmk_many(lngs, lats):
+    # list/numpy array 를 한번에 변환, numpy 입력이면 numpy 배열을 돌려준다
+    return get_transformer().transform(lngs, lats)
+
+
+class SGISTokenManager:
+    def __init__(self, key, secret, base_url=SGIS_API_URL, http=None):
+        self.key = key
+        self.secret = secret
+        self.base_url = base_url
+        self.http = http or session
+        self._token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self):
+        return self._token is not None and time.time() < self._expires_at - SGIS_TOKEN_LEEWAY
+
+    def _fetch(self):
+        response = self.http.get(f'{self.base_url}/auth/authentication.json', params={
+            'consumer_key': self.key,
+            'consumer_secret': self.secret,
+        }, timeout=SGIS_TIMEOUT)
+        con = json.loads(response.text)
+        result = con['result']
+        # accessTimeout 은 만료시각(ms epoch)
+        timeout = result.get('accessTimeout')
+        if timeout:
+            expires_at = int(timeout) / 1000
+        else:
+            expires_at = time.time() + SGIS_TOKEN_DEFAULT_TTL
+        return result['accessToken'], expires_at
+
+    def get_token(self):
+        if self._is_fresh():
+            return self._token
+        with self._lock:
+            # 락을 기다리는 동안 다른 스레드가 이미 갱신했을 수 있음
+            if not self._is_fresh():
+                self._token, self._expires_at = self._fetch()
+            return self._token
+
+    def invalidate(self, token=None):
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_at = 0
+
+
+token_manager = SGISTokenManager(
+    key=getattr(settings, 'SGIS_CONSUMER_KEY', 'your key'),
+    secret=getattr(settings, 'SGIS_CONSUMER_SECRET', 'your secret key'),
+)
+
+
+def rgeocode(x_coor, y_coor):
+    for _ in range(2):
+        accesstoken = token_manager.get_token()
+        response = token_manager.http.get(f'{token_manager.base_url}/addr/rgeocode.json', params={
+            'accessToken': accesstoken,
+            'x_coor': x_coor,
+            'y_coor': y_coor,
+            'addr_type': 21,
+        }, timeout=SGIS_TIMEOUT)
+        con = json.loads(response.text)
+        # 캐시된 토큰이 서버에서 만료된 경우 한번만 재발급
+        if con.get('errCd') != SGIS_TOKEN_EXPIRED_CODE:
+            break
+        token_manager.invalidate(accesstoken)
+    return con
 
 
 def location(lng, lat):
-    key = 'your key'
-    secret = 'your secret key'
-    req_url = f'https://sgisapi.kostat.go.kr/OpenAPI3/auth/authentication.json'
-    params = {
-        'consumer_key': key,
-        'consumer_secret': secret,
-    }
-
-    response = requests.get(req_url, params=params)
-    con = json.loads(response.text)
-    accesstoken = con['result']['accessToken']
-
-    proj_WGS84 = Proj(init='epsg:4326')
-    proj_UTMK = Proj(init='epsg:5178')
-    t_lng, t_lat = transform(proj_WGS84, proj_UTMK, lng, lat)
-    req_url1 = f'https://sgisapi.kostat.go.kr/OpenAPI3/addr/rgeocode.json'
-    params1 = {
-        'accessToken': accesstoken,
-        'x_coor': t_lng,
-        'y_coor': t_lat,
-        'addr_type': 21,
-    }
-
-    response = requests.get(req_url1, params=params1)
-    con = json.loads(response.text)
+    result = reverse_geocode(lng, lat)
+    if result is not None:
+        return result
+    if not SGIS_FALLBACK:
+        return "잘못된 정보를 입력하셨습니다. ", {'detail': 'KeyError'}
+    return sgis_location(lng, lat)
+
+
+def sgis_location(lng, lat):
+    t_lng, t_lat = to_utmk(float(lng), float(lat))
+    return sgis_location_utmk(t_lng, t_lat)
+
+
+def sgis_location_utmk(t_lng, t_lat):
+    con = rgeocode(t_lng, t_lat)
     sgg_nm = ""
     try:
         results = con['result']
-        if results:
-            adm_cd = results[0]['adm_dr_cd']
-            sido_nm = results[0]['sido_nm']
-            for n in results[0]['sgg_nm'].split(" "):
-                sgg_nm += n
-            emdong_nm = results[0]['emdong_nm']
+        if not results:
+            # 좌표에 해당하는 행정구역이 없는 경우 (바다, 국외 등)
+            return "잘못된 정보를 입력하셨습니다. ", {'detail': 'EmptyResult'}
+        adm_cd = results[0]['adm_dr_cd']
+        sido_nm = results[0]['sido_nm']
+        for n in results[0]['sgg_nm'].split(" "):
+            sgg_nm += n
+        emdong_nm = results[0]['emdong_nm']
         result = {
             'adm_cd': adm_cd,
             'sido_nm': sido_nm,
@@ -46,4 +155,4 @@ def location(lng, lat):
         }
         return result
     except KeyError as e:
-        return "잘못된 정보를 입력하셨습니다. ", {'detail': 'KeyError'}
\ No newline at end of file
+        return "잘못된 정보를 입력하셨습니다. ", {'detail': 'KeyError'}
@@ -0,0 +1,81 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from api.models import Profile, RelationShip
+
+
+class BenchmarkCommand(BaseCommand):
+    # benchmark_* 커맨드 공통: --repeat 번 돌려서 가장 빠른 시간을 쓴다
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def best_of(self, func, repeat=None):
+        best = None
+        for _ in range(repeat or self.repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def report(self, label, seconds, count=None):
+        line = f'{label}: {seconds * 1000:.1f} ms'
+        if count:
+            line += f' ({count / seconds:,.0f}/s)'
+        self.stdout.write(line)
+
+    def execute(self, *args, **options):
+        self.repeat = options.get('repeat') or 5
+        return super().execute(*args, **options)
+
+
+def seed_social_graph(profiles, degree, active_ratio=0.5, prefix='benchmark', batch=10000):
+    # 임의 연락처 그래프: profile 마다 degree 개의 연락처, active_ratio 만큼 앱 사용자. profile id 목록을 돌려준다
+    for i in range(0, profiles, batch):
+        User.objects.bulk_create([User(username=f'{prefix}-{n}') for n in range(i, min(i + batch, profiles))])
+    owner_ids = list(User.objects.filter(username__startswith=f'{prefix}-').values_list('id', flat=True))
+    for i in range(0, len(owner_ids), batch):
+        Profile.objects.bulk_create([Profile(owner_id=owner_id, is_app_user=random.random() < active_ratio)
+                                     for owner_id in owner_ids[i:i + batch]])
+    profile_ids = list(Profile.objects.filter(owner__username__startswith=f'{prefix}-').values_list('id', flat=True))
+    relations = []
+    for subject_id in profile_ids:
+        for object_id in random.sample(profile_ids, degree):
+            if object_id != subject_id:
+                relations.append(RelationShip(subject_id=subject_id, object_id=object_id, object_name='friend'))
+        if len(relations) >= batch:
+            RelationShip.objects.bulk_create(relations, ignore_conflicts=True)
+            relations = []
+    RelationShip.objects.bulk_create(relations, ignore_conflicts=True)
+    return profile_ids
+
+
+def orm_reachable(profile_id, max_hops=3):
+    # 단계마다 RelationShip 을 다시 조회하던 예전 방식 (비교 기준)
+    reachable = {}
+    visited = {profile_id}
+    frontier = []
+    inactive = []
+    for object_id, is_app_user in RelationShip.objects.filter(subject_id=profile_id) \
+            .values_list('object_id', 'object__is_app_user'):
+        (frontier if is_app_user else inactive).append(object_id)
+    frontier = [i for i in set(frontier) if i not in visited]
+    visited.update(frontier)
+    reachable.update((i, 1) for i in frontier)
+    bridged = set(RelationShip.objects.filter(object_id__in=inactive, subject__is_app_user=True)
+                  .values_list('subject_id', flat=True)) if inactive else set()
+    for hop in range(2, max_hops + 1):
+        next_ids = set(RelationShip.objects.filter(subject_id__in=frontier, object__is_app_user=True)
+                       .values_list('object_id', flat=True)) if frontier else set()
+        if hop == 2:
+            next_ids.update(bridged)
+        frontier = [i for i in next_ids if i not in visited]
+        if not frontier:
+            break
+        visited.update(frontier)
+        reachable.update((i, hop) for i in frontier)
+    return reachable
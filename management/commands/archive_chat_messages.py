@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api.chat_archive import archive_older_than, CHAT_ARCHIVE_AGE_DAYS, CHAT_ARCHIVE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = '오래된 ChatMessage 를 방/월 단위 gzip JSONL 아카이브로 옮기고 테이블에서 지웁니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=CHAT_ARCHIVE_AGE_DAYS)
+        parser.add_argument('--batch-size', type=int, default=CHAT_ARCHIVE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = archive_older_than(options['days'], options['batch_size'],
+                                   progress=lambda n: self.stdout.write(f'archived {n}'))
+        self.stdout.write(self.style.SUCCESS(f'done {total}'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Profile, DeletedProfile
+from api.phone import to_e164
+
+
+class Command(BaseCommand):
+    help = 'phone_number 로부터 E.164 phone_key 를 채웁니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for model in (Profile, DeletedProfile):
+            updated = 0
+            rows = []
+            queryset = model.objects.filter(phone_number__isnull=False).only('id', 'phone_number', 'phone_key')
+            for row in queryset.iterator(chunk_size=options['batch']):
+                phone_key = to_e164(row.phone_number)
+                if phone_key != row.phone_key:
+                    row.phone_key = phone_key
+                    rows.append(row)
+                if len(rows) >= options['batch']:
+                    model.objects.bulk_update(rows, ['phone_key'])
+                    updated += len(rows)
+                    rows = []
+            if rows:
+                model.objects.bulk_update(rows, ['phone_key'])
+                updated += len(rows)
+            self.stdout.write(self.style.SUCCESS(f'{model.__name__}: {updated}'))
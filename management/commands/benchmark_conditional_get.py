@@ -0,0 +1,50 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.models import Product, Profile
+from api.renderers import dumps
+from api.views import product_feed_response
+
+from ._benchmark import BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = '상품 피드 한 페이지를 ETag 없이 받을 때와 If-None-Match 로 304 를 받을 때의 ' \
+           '응답 크기와 처리 시간을 비교합니다. 데이터는 끝나면 rollback 합니다.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--products', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        seller = Profile.objects.create(owner=User.objects.create(username='benchmark-etag'))
+        Product.objects.bulk_create([
+            Product(seller=seller, title=f'product {i}', content='content ' * 20, quality='10', price=10000 + i)
+            for i in range(options['products'])
+        ])
+        factory = APIRequestFactory()
+
+        def get(headers):
+            request = Request(factory.get('/product/location/', **headers))
+            response = product_feed_response(request, Product.objects.filter(seller=seller))
+            # 200 이면 CommonJSONRenderer 와 같은 방식으로 body 를 만든다
+            return response, dumps(response.data) if response.data is not None else b''
+
+        response, body = get({})
+        etag = response['ETag']
+        not_modified, empty = get({'HTTP_IF_NONE_MATCH': etag})
+        assert not_modified.status_code == 304
+
+        full = self.best_of(lambda: get({}))
+        cached = self.best_of(lambda: get({'HTTP_IF_NONE_MATCH': etag}))
+        self.report(f'200 ({len(body):,} bytes)', full)
+        self.report(f'304 ({len(empty):,} bytes)', cached)
+        self.stdout.write(self.style.SUCCESS(f'304 saves {len(body) - len(empty):,} bytes and '
+                                             f'{(full - cached) * 1000:.1f} ms per poll'))
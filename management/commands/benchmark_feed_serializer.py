@@ -0,0 +1,44 @@
+from django.utils import timezone
+
+from api.models import Product, ProductImage
+from api.reference_data import reference_data
+from api.serializers import ProductSerializers, ProductFeedSerializer
+
+from ._benchmark import BenchmarkCommand
+
+
+def make_products(count):
+    # DB 에 저장하지 않은 Product 와 prefetch 된 것과 같은 상태의 product_images
+    now = timezone.now()
+    products = []
+    for i in range(1, count + 1):
+        product = Product(
+            id=i, area_id=1, seller_id=i % 100 + 1, category_id=1, start_baby_age_id=1, end_baby_age_id=2,
+            title=f'product {i}', content='content ' * 20, quality='10', price=10000 + i, state='10',
+            read_count=i, chat_count=i % 7, created_time=now, modified_time=now,
+        )
+        images = ProductImage.objects.none()
+        images._result_cache = [ProductImage(id=i * 10 + n, product_id=i, image=f'product/{i}_{n}.jpg')
+                                for n in range(3)]
+        images._prefetch_done = True
+        product._prefetched_objects_cache = {'product_images': images}
+        products.append(product)
+    return products
+
+
+class Command(BenchmarkCommand):
+    help = 'ProductFeedSerializer 와 ProductSerializers(many=True) 의 직렬화 시간을 비교합니다.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--count', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        products = make_products(options['count'])
+        # 카테고리 이름 조회는 두 쪽 모두 캐시를 쓰므로 시간 측정 전에 채워둔다
+        reference_data.warm()
+        full = self.best_of(lambda: ProductSerializers(products, many=True).data)
+        feed = self.best_of(lambda: ProductFeedSerializer(products, many=True).data)
+        self.report('ProductSerializers(many=True)', full)
+        self.report('ProductFeedSerializer', feed)
+        self.stdout.write(self.style.SUCCESS(f'{options["count"]} products, {full / feed:.1f}x faster'))
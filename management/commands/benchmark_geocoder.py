@@ -0,0 +1,38 @@
+import random
+
+from django.core.management.base import CommandError
+
+from api.geocoder import LocalGeocoder, get_geocoder
+
+from ._benchmark import BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = '로컬 읍면동 경계 인덱스의 역지오코딩 처리량 (lookups/s) 을 잽니다.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--count', type=int, default=300000)
+        parser.add_argument('--path', help='EMDONG_BOUNDARY_PATH 대신 쓸 GeoJSON')
+
+    def handle(self, *args, **options):
+        geocoder = LocalGeocoder.from_geojson(options['path']) if options['path'] else get_geocoder()
+        if geocoder is None:
+            raise CommandError('EMDONG_BOUNDARY_PATH 또는 --path 가 필요합니다.')
+        # 경계 데이터 전체를 덮는 사각형 안의 임의 좌표
+        min_x = min(region.bbox[0] for region in geocoder.regions)
+        min_y = min(region.bbox[1] for region in geocoder.regions)
+        max_x = max(region.bbox[2] for region in geocoder.regions)
+        max_y = max(region.bbox[3] for region in geocoder.regions)
+        count = options['count']
+        points = [(random.uniform(min_x, max_x), random.uniform(min_y, max_y)) for _ in range(count)]
+
+        hits = sum(1 for lng, lat in points[:10000] if geocoder.lookup(lng, lat) is not None)
+
+        def lookup_all():
+            for lng, lat in points:
+                geocoder.lookup(lng, lat)
+
+        self.report(f'{len(geocoder.regions)} regions, {len(geocoder.grid)} grid cells', self.best_of(lookup_all),
+                    count)
+        self.stdout.write(self.style.SUCCESS(f'hit rate {hits / min(count, 10000):.1%} (바다/국외 좌표는 miss)'))
@@ -0,0 +1,56 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory
+
+from api.models import Profile, Transaction
+from api.response_handler import custom_paginator, cursor_paginator, encode_cursor
+from api.serializers import TransactionSerializer
+
+from ._benchmark import BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = 'OFFSET 페이지네이션과 keyset 커서 페이지네이션을 1 페이지 / 깊은 페이지에서 비교합니다. ' \
+           '판매내역(Transaction) 을 rows 개 만들고 끝나면 rollback 합니다.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--page', type=int, default=5000)
+        parser.add_argument('--batch', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        seller = Profile.objects.create(owner=User.objects.create(username='benchmark-pagination'))
+        for i in range(0, options['rows'], options['batch']):
+            size = min(options['batch'], options['rows'] - i)
+            Transaction.objects.bulk_create([Transaction(seller=seller) for _ in range(size)])
+        self.stdout.write(f'seeded {options["rows"]} rows')
+
+        # SellHistory.get 과 같은 queryset
+        queryset = Transaction.objects.filter(seller=seller)
+        page_size = api_settings.PAGE_SIZE
+        factory = APIRequestFactory()
+        # page 번째 페이지의 커서는 바로 앞 페이지 마지막 row 로 만든다
+        before = queryset.order_by('-created_time', '-id')[(options['page'] - 1) * page_size - 1]
+        cursor = encode_cursor(before.created_time, before.id)
+
+        def offset(page):
+            request = Request(factory.get('/history/sell/', {'page': page}))
+            return lambda: custom_paginator(request, queryset, TransactionSerializer)
+
+        def keyset(params):
+            request = Request(factory.get('/history/sell/', params))
+            return lambda: cursor_paginator(request, queryset, TransactionSerializer)
+
+        page = options['page']
+        self.report('OFFSET page 1', self.best_of(offset(1)))
+        self.report(f'OFFSET page {page}', self.best_of(offset(page)))
+        self.report('cursor page 1', self.best_of(keyset({})))
+        self.report(f'cursor page {page}', self.best_of(keyset({'cursor': cursor})))
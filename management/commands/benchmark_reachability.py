@@ -0,0 +1,55 @@
+import random
+import time
+
+from django.db import transaction
+
+from api.models import Product, ReachableSeller
+from api.reachability import rebuild_profile
+from api.social_graph import SocialGraph
+
+from ._benchmark import BenchmarkCommand, orm_reachable, seed_social_graph
+
+
+class Command(BenchmarkCommand):
+    help = '임의 연락처 그래프에서 ReachableSeller 인덱스 조회와 단계별 RelationShip 조회를 비교합니다. ' \
+           '데이터는 끝나면 rollback 합니다.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--profiles', type=int, default=100000)
+        parser.add_argument('--degree', type=int, default=20)
+        parser.add_argument('--sample', type=int, default=100)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        profile_ids = seed_social_graph(options['profiles'], options['degree'])
+        self.stdout.write(f'seeded {len(profile_ids)} profiles, degree {options["degree"]}')
+
+        started = time.perf_counter()
+        graph = SocialGraph.load()
+        self.report('SocialGraph.load', time.perf_counter() - started)
+        sample = random.sample([i for n, i in enumerate(graph.ids) if graph.active[n]], options['sample'])
+        started = time.perf_counter()
+        for profile_id in sample:
+            rebuild_profile(profile_id, graph)
+        self.report('rebuild_profile', time.perf_counter() - started, len(sample))
+
+        # ProductOfFriendsView: 판매자 목록 + 상품 쿼리
+        def hop_queries():
+            for profile_id in sample:
+                list(Product.objects.filter(seller_id__in=list(orm_reachable(profile_id))).values_list('id')[:20])
+
+        def indexed():
+            for profile_id in sample:
+                sellers = ReachableSeller.objects.filter(profile_id=profile_id).values('seller_id')
+                list(Product.objects.filter(seller_id__in=sellers).values_list('id')[:20])
+
+        before = self.best_of(hop_queries)
+        after = self.best_of(indexed)
+        self.report('feed with hop queries', before, len(sample))
+        self.report('feed with ReachableSeller', after, len(sample))
+        self.stdout.write(self.style.SUCCESS(f'{before / after:.1f}x faster'))
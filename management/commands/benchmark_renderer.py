@@ -0,0 +1,33 @@
+from rest_framework.renderers import JSONRenderer
+
+from api.reference_data import reference_data
+from api.renderers import CommonJSONRenderer, orjson
+from api.serializers import ProductFeedSerializer
+
+from ._benchmark import BenchmarkCommand
+from .benchmark_feed_serializer import make_products
+
+
+class Command(BenchmarkCommand):
+    help = 'CommonResponse envelope 를 CommonJSONRenderer 와 DRF JSONRenderer 로 렌더링하는 시간을 비교합니다.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--count', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        reference_data.warm()
+        # 피드 응답과 같은 모양: datetime, 이미지 URL 을 담은 상품 목록
+        payload = ProductFeedSerializer(make_products(options['count']), many=True).data
+        data = {'code': '2000000', 'message': '요청에 성공했습니다.', 'payload': payload}
+        drf = JSONRenderer()
+        fast = CommonJSONRenderer()
+        drf_body = drf.render(data)
+        fast_body = fast.render(data)
+
+        before = self.best_of(lambda: drf.render(data))
+        after = self.best_of(lambda: fast.render(data))
+        self.report(f'DRF JSONRenderer ({len(drf_body):,} bytes)', before)
+        self.report(f'CommonJSONRenderer ({len(fast_body):,} bytes, '
+                    f'{"orjson" if orjson is not None else "json fallback"})', after)
+        self.stdout.write(self.style.SUCCESS(f'{options["count"]} products, {before / after:.1f}x faster'))
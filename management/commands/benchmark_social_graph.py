@@ -0,0 +1,42 @@
+import random
+import time
+
+from django.db import transaction
+
+from api.reachability import compute_reachable
+from api.social_graph import SocialGraph
+
+from ._benchmark import BenchmarkCommand, orm_reachable, seed_social_graph
+
+
+class Command(BenchmarkCommand):
+    help = 'SocialGraph 탐색 엔진과 단계별 RelationShip ORM 조회를 비교합니다. 데이터는 끝나면 rollback 합니다.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--profiles', type=int, default=100000)
+        parser.add_argument('--degree', type=int, default=20)
+        parser.add_argument('--sample', type=int, default=100)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        seed_social_graph(options['profiles'], options['degree'])
+        started = time.perf_counter()
+        graph = SocialGraph.load()
+        self.report('SocialGraph.load (full)', time.perf_counter() - started)
+        sample = random.sample([i for n, i in enumerate(graph.ids) if graph.active[n]], options['sample'])
+        count = len(sample)
+
+        orm = self.best_of(lambda: [orm_reachable(profile_id) for profile_id in sample])
+        around = self.best_of(lambda: [compute_reachable(profile_id) for profile_id in sample])
+        loaded = self.best_of(lambda: [graph.reachable_ids(profile_id) for profile_id in sample])
+        self.report('ORM hop queries', orm, count)
+        self.report('SocialGraph.load_around + reachable', around, count)
+        self.report('loaded SocialGraph.reachable', loaded, count)
+        mismatched = sum(1 for profile_id in sample if orm_reachable(profile_id) != graph.reachable_ids(profile_id))
+        self.stdout.write(self.style.SUCCESS(f'{orm / loaded:.0f}x faster with a loaded graph, '
+                                             f'{mismatched} mismatched results'))
@@ -0,0 +1,40 @@
+import random
+
+from pyproj import Transformer
+
+from api.location import get_transformer, to_utmk, to_utmk_many
+
+from ._benchmark import BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = 'WGS84 -> UTM-K 변환을 좌표마다 하는 경우와 배열로 한번에 하는 경우의 처리량을 비교합니다.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--count', type=int, default=100000)
+        parser.add_argument('--uncached-count', type=int, default=200,
+                            help='요청마다 Transformer 를 만들던 예전 방식으로 변환할 좌표 수')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        lngs = [random.uniform(126.0, 129.5) for _ in range(count)]
+        lats = [random.uniform(34.0, 38.5) for _ in range(count)]
+        get_transformer()
+
+        uncached = options['uncached_count']
+
+        def per_request():
+            for lng, lat in zip(lngs[:uncached], lats[:uncached]):
+                Transformer.from_crs('EPSG:4326', 'EPSG:5178', always_xy=True).transform(lng, lat)
+
+        def per_point():
+            for lng, lat in zip(lngs, lats):
+                to_utmk(lng, lat)
+
+        self.report('Transformer per request', self.best_of(per_request, 1), uncached)
+        point = self.best_of(per_point)
+        self.report('cached Transformer, per point', point, count)
+        batch = self.best_of(lambda: to_utmk_many(lngs, lats))
+        self.report('cached Transformer, batched', batch, count)
+        self.stdout.write(self.style.SUCCESS(f'{count} points, batched {point / batch:.1f}x faster than per point'))
@@ -0,0 +1,47 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bulk_location import bulk_update_locations, BULK_LOCATION_WORKERS
+
+
+class Command(BaseCommand):
+    help = 'JSONL({"owner", "lng", "lat"}) 을 읽어 Profile.area 를 일괄 갱신합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='JSONL 파일 경로, 생략하면 stdin')
+        parser.add_argument('--chunk', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=BULK_LOCATION_WORKERS)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        totals = {'total': 0, 'resolved': 0, 'failed': 0, 'updated': 0, 'elapsed': 0}
+        try:
+            chunk = []
+            for line_no, line in enumerate(stream, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    chunk.append(json.loads(line))
+                except ValueError:
+                    raise CommandError(f'line {line_no}: invalid json')
+                if len(chunk) >= options['chunk']:
+                    self._flush(chunk, totals, options['workers'])
+                    chunk = []
+            if chunk:
+                self._flush(chunk, totals, options['workers'])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(self.style.SUCCESS(f'done {totals}'))
+
+    def _flush(self, chunk, totals, workers):
+        stats = bulk_update_locations(chunk, workers=workers)
+        for key in totals:
+            totals[key] += stats[key]
+        rate = totals['total'] / totals['elapsed'] if totals['elapsed'] else 0
+        self.stdout.write(f"processed={totals['total']} updated={totals['updated']} "
+                          f"failed={totals['failed']} rate={rate:.1f}/s")
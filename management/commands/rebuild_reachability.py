@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.models import PendingReachabilityRebuild
+from api.reachability import rebuild_profile, rebuild_pending
+from api.social_graph import SocialGraph
+
+# 대기 중인 profile 이 이보다 많으면 profile 마다 주변 그래프를 읽지 않고 전체 그래프를 한번 로드한다
+REACHABILITY_PENDING_FULL_LOAD = getattr(settings, 'REACHABILITY_PENDING_FULL_LOAD', 1000)
+
+
+class Command(BaseCommand):
+    help = 'ReachableSeller 인덱스를 전체 또는 지정한 profile 에 대해 다시 계산합니다. ' \
+           '--pending 은 연락처 import 로 쌓인 큐를 처리합니다 (cron 으로 주기 실행).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile_ids', nargs='*', type=int)
+        parser.add_argument('--pending', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['pending']:
+            graph = None
+            if PendingReachabilityRebuild.objects.count() > REACHABILITY_PENDING_FULL_LOAD:
+                graph = SocialGraph.load()
+            count = rebuild_pending(graph, progress=lambda n: self.stdout.write(f'rebuilt {n}'))
+            self.stdout.write(self.style.SUCCESS(f'done {count}'))
+            return
+
+        graph = SocialGraph.load()
+        profile_ids = options['profile_ids']
+        if not profile_ids:
+            profile_ids = [profile_id for i, profile_id in enumerate(graph.ids) if graph.active[i]]
+        count = 0
+        for profile_id in profile_ids:
+            rebuild_profile(profile_id, graph)
+            count += 1
+            if count % 1000 == 0:
+                self.stdout.write(f'rebuilt {count}')
+        self.stdout.write(self.style.SUCCESS(f'done {count}'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Profile/Product 의 비정규화 카운터를 원본 테이블 기준으로 다시 맞춥니다.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            result = reconcile()
+        self.stdout.write(self.style.SUCCESS(f'done {result}'))
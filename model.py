@@ -1,7 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from django.contrib.auth.models import User
 import uuid
 
+from .phone import to_e164
+
 
 def unique_profile_image_name(instance, filename):
     extension = filename.split('.')[-1]
@@ -30,6 +34,10 @@ class Profile(models.Model):
     area = models.ForeignKey('Area', on_delete=models.SET_NULL, related_name='profile_of_areas',
                              related_query_name='profile_of_area', null=True)
     score = models.FloatField(default=0)
+    # counters.py 에서 Recommend/Evaluation 저장 시 갱신하는 비정규화 값
+    recommend_count = models.IntegerField(default=0)
+    review_count = models.IntegerField(default=0)
+    score_sum = models.IntegerField(default=0)
     fcm_token = models.TextField(null=True, blank=True)
     app_version = models.CharField(max_length=20, null=True, blank=True)
     platform = models.CharField(max_length=10, null=True, blank=True)
@@ -38,6 +46,7 @@ class Profile(models.Model):
     is_app_user = models.BooleanField(default=False)
     friends = models.ManyToManyField('self', through='RelationShip', symmetrical=False)
     phone_number = models.CharField(max_length=13, null=True, blank=True)
+    phone_key = models.CharField(max_length=16, null=True, blank=True, db_index=True)  # E.164
     is_del = models.BooleanField(default=False)
     created_time = models.DateTimeField(auto_now_add=True)
     modified_time = models.DateTimeField(auto_now=True)
@@ -45,15 +54,23 @@ class Profile(models.Model):
     def __str__(self):
         return self.owner.username
 
+    def save(self, *args, **kwargs):
+        self.phone_key = to_e164(self.phone_number)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone_number' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'phone_key'}
+        super().save(*args, **kwargs)
+
     @property
     def stamps_count(self):
-        return self.object_of_stamps.all().count()
+        return self.recommend_count
 
 
 class DeletedProfile(models.Model):
     profile_id = models.IntegerField()
     name = models.CharField(max_length=10, null=True, blank=True)  # 닉네임
     phone_number = models.CharField(max_length=13, null=True, blank=True)
+    phone_key = models.CharField(max_length=16, null=True, blank=True, db_index=True)  # E.164
     score = models.FloatField(default=0)
     fcm_token = models.TextField(null=True, blank=True)
     app_version = models.CharField(max_length=20, null=True, blank=True)
@@ -62,6 +79,10 @@ class DeletedProfile(models.Model):
                               blank=True)
     dt_deleted = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        self.phone_key = to_e164(self.phone_number)
+        super().save(*args, **kwargs)
+
 
 class TermsAgreement(models.Model):
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='profile_of_agrees',
@@ -95,6 +116,24 @@ class RelationShip(models.Model):
         unique_together = ('subject', 'object')
 
 
+class ReachableSeller(models.Model):
+    # profile 의 피드에 노출될 수 있는 판매자 (친구의 친구 ... 까지 미리 계산)
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='reachable_sellers',
+                                related_query_name='reachable_seller')
+    seller = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='reachable_from',
+                               related_query_name='reachable_from')
+    hops = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('profile', 'seller')
+
+
+class PendingReachabilityRebuild(models.Model):
+    # 연락처 대량 import 처럼 요청 안에서 다시 계산하기 무거운 profile. rebuild_reachability --pending 이 처리한다
+    profile = models.OneToOneField(Profile, on_delete=models.CASCADE, related_name='pending_reachability_rebuild')
+    created_time = models.DateTimeField(auto_now_add=True)
+
+
 class TestPhoneNumber(models.Model):
     phone_number = models.CharField(max_length=13, unique=True)
 
@@ -146,6 +185,7 @@ class Product(models.Model):
     price = models.IntegerField()
     state = models.CharField(max_length=10, choices=STATE_CHOICE, default=10)
     read_count = models.IntegerField(default=0)
+    chat_count = models.IntegerField(default=0)
     created_time = models.DateTimeField(auto_now_add=True)
     modified_time = models.DateTimeField(auto_now=True)
 
@@ -162,7 +202,7 @@ class ProductImage(models.Model):
 
 
 class Area(models.Model):
-    code = models.CharField(max_length=20)
+    code = models.CharField(max_length=20, unique=True)
     # full_name = models.CharField(max_length=200)
     unit1 = models.CharField(max_length=20, null=True)
     unit2 = models.CharField(max_length=20, null=True)
@@ -196,6 +236,13 @@ class Transaction(models.Model):
     created_time = models.DateTimeField(auto_now_add=True)
     modified_time = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # 판매/구매 내역의 (created_time, id) keyset 페이지네이션용
+        indexes = [
+            models.Index(fields=['seller', 'created_time', 'id']),
+            models.Index(fields=['buyer', 'created_time', 'id']),
+        ]
+
 
 class Evaluation(models.Model):
     SCORE_CHOICE = (
@@ -229,21 +276,63 @@ class ChatRoom(models.Model):
                               related_query_name='buyer_of_chat_room')
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='product_of_chat_rooms',
                                 related_query_name='product_of_chat_room')
+    # *_last_num: 각 참여자가 마지막으로 읽은 메시지의 num, last_num: 방의 마지막 메시지 num
     seller_last_num = models.BigIntegerField(default=0)
     buyer_last_num = models.BigIntegerField(default=0)
+    last_num = models.BigIntegerField(default=0)
+    last_message = models.ForeignKey('ChatMessage', on_delete=models.SET_NULL, null=True, related_name='+')
     created_time = models.DateTimeField(auto_now_add=True)
     modified_time = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # 채팅방 목록의 (created_time, id) keyset 페이지네이션용
+        indexes = [models.Index(fields=['created_time', 'id'])]
+
+    def unread_count(self, profile_id):
+        if profile_id == self.seller_id:
+            return max(self.last_num - self.seller_last_num, 0)
+        return max(self.last_num - self.buyer_last_num, 0)
+
 
 class ChatMessage(models.Model):
     room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='chat_messages',
                              related_query_name='chat_message')
     sender = models.ForeignKey(Profile, on_delete=models.SET_NULL, null=True)
+    num = models.BigIntegerField(default=0)  # 방 안에서의 순번
     content = models.TextField()
     readers = models.CharField(max_length=200)
     created_time = models.DateTimeField(auto_now_add=True)
     modified_time = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['room', 'id'])]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None or self.num:
+            return super().save(*args, **kwargs)
+        # 방 row 의 UPDATE 가 잠금 역할을 해서 같은 방의 num 이 겹치지 않는다
+        with transaction.atomic():
+            ChatRoom.objects.filter(id=self.room_id).update(last_num=F('last_num') + 1)
+            self.num = ChatRoom.objects.filter(id=self.room_id).values_list('last_num', flat=True).get()
+            super().save(*args, **kwargs)
+            ChatRoom.objects.filter(id=self.room_id).update(last_message_id=self.id, modified_time=timezone.now())
+
+
+class ChatArchiveSegment(models.Model):
+    # 오래된 ChatMessage 를 방/월 단위 gzip JSONL 파일로 옮긴 기록 (chat_archive.py)
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='archive_segments',
+                             related_query_name='archive_segment')
+    month = models.CharField(max_length=7)  # YYYY-MM
+    path = models.CharField(max_length=255)
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    count = models.IntegerField(default=0)
+    created_time = models.DateTimeField(auto_now_add=True)
+    modified_time = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('room', 'month')
+
 
 class Notice(models.Model):
     title = models.CharField(max_length=200)
@@ -0,0 +1,21 @@
+import re
+
+_NON_DIGIT = re.compile(r'\D')
+
+
+def normalize_phone_number(number):
+    # '+82 10-1234-5678', '010-1234-5678' -> '01012345678'
+    digits = _NON_DIGIT.sub('', str(number or ''))
+    if digits.startswith('82') and len(digits) > 10:
+        digits = '0' + digits[2:]
+    if not 9 <= len(digits) <= 11:
+        return None
+    return digits
+
+
+def to_e164(number):
+    # '010-1234-5678' -> '+821012345678', Profile.phone_key 에 저장되는 형식
+    digits = normalize_phone_number(number)
+    if digits is None:
+        return None
+    return '+82' + digits[1:]
@@ -0,0 +1,98 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Profile
+from .phone import to_e164
+
+PHONE_INDEX_CAPACITY = getattr(settings, 'PHONE_INDEX_CAPACITY', 1000000)
+PHONE_INDEX_ERROR_RATE = getattr(settings, 'PHONE_INDEX_ERROR_RATE', 0.01)
+PHONE_INDEX_TTL = getattr(settings, 'PHONE_INDEX_TTL', 60 * 10)  # second
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class PhoneIndex:
+    # 앱 사용자 번호의 Bloom filter. 없다고 하면 확실히 없고, 있다고 하면 DB 로 확인한다
+    def __init__(self, capacity=PHONE_INDEX_CAPACITY, error_rate=PHONE_INDEX_ERROR_RATE, ttl=PHONE_INDEX_TTL):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.ttl = ttl
+        self._bloom = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    def _stale(self):
+        return self._bloom is None or time.time() - self._loaded_at > self.ttl
+
+    def reload(self):
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        for phone_key in Profile.objects.filter(is_app_user=True, phone_key__isnull=False) \
+                .values_list('phone_key', flat=True).iterator():
+            bloom.add(phone_key)
+        with self._lock:
+            self._bloom = bloom
+            self._loaded_at = time.time()
+
+    def _get(self):
+        # 만료 시점에 몰린 요청이 각자 전체 번호를 읽지 않도록 한 스레드만 다시 로드한다
+        if self._stale():
+            with self._reload_lock:
+                if self._stale():
+                    self.reload()
+        return self._bloom
+
+    def add(self, phone_key):
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(phone_key)
+
+    def app_users_among(self, numbers):
+        # {입력 번호: profile_id}
+        bloom = self._get()
+        candidates = {}
+        for number in numbers:
+            phone_key = to_e164(number)
+            if phone_key and phone_key in bloom:
+                candidates.setdefault(phone_key, []).append(number)
+        if not candidates:
+            return {}
+        result = {}
+        for phone_key, profile_id in Profile.objects.filter(phone_key__in=list(candidates), is_app_user=True) \
+                .values_list('phone_key', 'id'):
+            for number in candidates[phone_key]:
+                result[number] = profile_id
+        return result
+
+
+phone_index = PhoneIndex()
+
+
+@receiver(post_save, sender=Profile)
+def profile_phone_saved(sender, instance, **kwargs):
+    if instance.is_app_user and instance.phone_key:
+        phone_index.add(instance.phone_key)
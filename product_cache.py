@@ -0,0 +1,107 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Product, ProductImage, Transaction
+
+PRODUCT_CACHE_ALIAS = getattr(settings, 'PRODUCT_CACHE_ALIAS', 'default')
+PRODUCT_CACHE_TTL = getattr(settings, 'PRODUCT_CACHE_TTL', 60 * 5)  # second
+PRODUCT_CACHE_LOCK_TTL = 10  # 다른 프로세스가 payload 를 만드는 동안 기다리는 최대 시간
+PRODUCT_CACHE_WAIT = 0.05
+PRODUCT_CACHE_LOCK_STRIPES = 64
+
+
+class ProductDetailCache:
+    def __init__(self, alias=PRODUCT_CACHE_ALIAS, ttl=PRODUCT_CACHE_TTL):
+        self.alias = alias
+        self.ttl = ttl
+        self._locks = [threading.Lock() for _ in range(PRODUCT_CACHE_LOCK_STRIPES)]
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def key(self, product_id):
+        return f'product:detail:{product_id}'
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _local_lock(self, product_id):
+        return self._locks[hash(product_id) % PRODUCT_CACHE_LOCK_STRIPES]
+
+    def get_or_build(self, product_id, build):
+        # build() 는 payload 또는 상품이 없으면 None 을 돌려준다
+        key = self.key(product_id)
+        payload = self.cache.get(key)
+        if payload is not None:
+            self._count(True)
+            return payload
+        # 같은 프로세스에서는 스레드 락, 프로세스 간에는 cache.add 로 한 요청만 DB 를 조회한다
+        with self._local_lock(product_id):
+            payload = self.cache.get(key)
+            if payload is not None:
+                self._count(True)
+                return payload
+            lock_key = f'{key}:lock'
+            deadline = time.time() + PRODUCT_CACHE_LOCK_TTL
+            acquired = self.cache.add(lock_key, 1, PRODUCT_CACHE_LOCK_TTL)
+            while not acquired:
+                if time.time() > deadline:
+                    break
+                time.sleep(PRODUCT_CACHE_WAIT)
+                payload = self.cache.get(key)
+                if payload is not None:
+                    self._count(True)
+                    return payload
+                acquired = self.cache.add(lock_key, 1, PRODUCT_CACHE_LOCK_TTL)
+            self._count(False)
+            try:
+                payload = build()
+                if payload is not None:
+                    self.cache.set(key, payload, self.ttl)
+                return payload
+            finally:
+                if acquired:
+                    self.cache.delete(lock_key)
+
+    def invalidate(self, product_id):
+        if product_id:
+            self.cache.delete(self.key(product_id))
+
+    def stats(self):
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+product_detail_cache = ProductDetailCache()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    product_detail_cache.invalidate(instance.id)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def product_relation_changed(sender, instance, **kwargs):
+    product_detail_cache.invalidate(instance.product_id)
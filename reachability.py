@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Profile, RelationShip, ReachableSeller, PendingReachabilityRebuild
+from .social_graph import SocialGraph
+
+REACHABILITY_MAX_HOPS = getattr(settings, 'REACHABILITY_MAX_HOPS', 3)
+REACHABILITY_BATCH_SIZE = getattr(settings, 'REACHABILITY_BATCH_SIZE', 1000)
+
+
+def compute_reachable(profile_id, max_hops=REACHABILITY_MAX_HOPS):
+    # {seller_id: hops}, 규칙은 SocialGraph.reachable 하나만 쓰고 DB 에서는 주변 부분 그래프만 읽는다
+    graph = SocialGraph.load_around(profile_id, max_hops)
+    return graph.reachable_ids(profile_id, max_hops)
+
+
+def rebuild_profile(profile_id, graph=None):
+    # 전체 재계산 시에는 한번 로드한 SocialGraph 를 넘겨서 profile 마다 쿼리하지 않는다
+    if graph is not None:
+        reachable = graph.reachable_ids(profile_id)
+    else:
+        reachable = compute_reachable(profile_id)
+    with transaction.atomic():
+        ReachableSeller.objects.filter(profile_id=profile_id).delete()
+        ReachableSeller.objects.bulk_create([
+            ReachableSeller(profile_id=profile_id, seller_id=seller_id, hops=hops)
+            for seller_id, hops in reachable.items()
+        ])
+
+
+def affected_profiles(profile_ids):
+    # profile_ids 를 경유해서 판매자에 닿을 수 있는 profile 들
+    # 비회원 연락처를 공유하거나 연락처로 가진 경우도 포함하기 위해 역방향 관계까지 seed 로 본다
+    seeds = set(profile_ids)
+    seeds.update(RelationShip.objects.filter(object_id__in=profile_ids).values_list('subject_id', flat=True))
+    affected = set(seeds)
+    affected.update(ReachableSeller.objects.filter(seller_id__in=seeds, hops__lt=REACHABILITY_MAX_HOPS)
+                    .values_list('profile_id', flat=True))
+    return affected
+
+
+def contact_import_affected(subject, object_ids, batch_size=REACHABILITY_BATCH_SIZE):
+    # subject 가 object_ids 를 연락처로 추가했을 때 ReachableSeller 가 바뀌는 앱 사용자
+    # - subject 와 subject 에 닿는 profile (subject 를 거쳐 새 판매자에 닿는다)
+    # - 새로 연결된 비회원 연락처를 이미 가진 profile (bridge 로 subject 에 닿는다)
+    # 비회원 profile 은 피드를 보지 않으므로 다시 계산하지 않는다
+    affected = {subject.id} if subject.is_app_user else set()
+    affected.update(ReachableSeller.objects.filter(seller_id=subject.id, hops__lt=REACHABILITY_MAX_HOPS,
+                                                   profile__is_app_user=True).values_list('profile_id', flat=True))
+    object_ids = list(object_ids)
+    for i in range(0, len(object_ids), batch_size):
+        affected.update(RelationShip.objects.filter(object_id__in=object_ids[i:i + batch_size],
+                                                    object__is_app_user=False, subject__is_app_user=True)
+                        .exclude(subject_id=subject.id).values_list('subject_id', flat=True))
+    return affected
+
+
+def enqueue_rebuild(profile_ids, batch_size=REACHABILITY_BATCH_SIZE):
+    # 요청 경로에서는 표시만 하고 rebuild_reachability --pending 이 나중에 다시 계산한다
+    PendingReachabilityRebuild.objects.bulk_create(
+        [PendingReachabilityRebuild(profile_id=profile_id) for profile_id in profile_ids],
+        batch_size=batch_size, ignore_conflicts=True,
+    )
+
+
+def rebuild_pending(graph=None, batch_size=REACHABILITY_BATCH_SIZE, progress=None):
+    count = 0
+    while True:
+        pending = list(PendingReachabilityRebuild.objects.order_by('id').values_list('id', 'profile_id')[:batch_size])
+        if not pending:
+            return count
+        for pending_id, profile_id in pending:
+            # 큐에서 지우는 것과 다시 계산하는 것을 같이 commit 해서 실패하면 큐에 남는다
+            with transaction.atomic():
+                PendingReachabilityRebuild.objects.filter(id=pending_id).delete()
+                rebuild_profile(profile_id, graph)
+            count += 1
+        if progress:
+            progress(count)
+
+
+def schedule_rebuild(profile_ids):
+    def rebuild():
+        for profile_id in affected_profiles(profile_ids):
+            rebuild_profile(profile_id)
+
+    transaction.on_commit(rebuild)
+
+
+@receiver(post_save, sender=RelationShip)
+def relationship_saved(sender, instance, created, **kwargs):
+    if created:
+        schedule_rebuild([instance.subject_id, instance.object_id])
+
+
+@receiver(post_delete, sender=RelationShip)
+def relationship_deleted(sender, instance, **kwargs):
+    schedule_rebuild([instance.subject_id, instance.object_id])
+
+
+@receiver(post_init, sender=Profile)
+def profile_loaded(sender, instance, **kwargs):
+    # only()/defer() 로 is_app_user 를 읽지 않은 경우 속성에 접근하면 row 마다 refresh 쿼리가 나간다
+    instance._original_is_app_user = instance.__dict__.get('is_app_user')
+
+
+# queryset.update() 로 is_app_user 를 바꾸면 signal 이 오지 않으니 rebuild_reachability 커맨드를 돌려야 한다
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, created, **kwargs):
+    current = instance.__dict__.get('is_app_user')
+    original = instance._original_is_app_user
+    # 처음 값을 모르는 채로 저장되었으면 바뀌었을 수 있으므로 다시 계산한다
+    if not created and current is not None and current != original:
+        schedule_rebuild([instance.id])
+    instance._original_is_app_user = current
@@ -0,0 +1,77 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from .counters import increment_read_count
+
+logger = logging.getLogger(__name__)
+
+# second, 0 이면 버퍼링하지 않고 조회마다 바로 반영
+READ_COUNT_FLUSH_INTERVAL = getattr(settings, 'READ_COUNT_FLUSH_INTERVAL', 10)
+
+
+class ReadCountBuffer:
+    # 상품 조회수를 메모리에 모았다가 주기적으로 상품당 UPDATE 한번으로 반영
+    def __init__(self, interval=READ_COUNT_FLUSH_INTERVAL):
+        if interval < 0:
+            raise ValueError(f'READ_COUNT_FLUSH_INTERVAL must be >= 0, got {interval}')
+        self.interval = interval
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def increment(self, product_id, amount=1):
+        with self._lock:
+            self._counts[product_id] += amount
+            if self._thread is None and self.interval:
+                self._start()
+        if not self.interval:
+            # flush 스레드 없이 모아두기만 하면 조회수가 반영되지 않으므로 바로 반영한다
+            self.flush()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='read-count-flush', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('read_count flush failed')
+            finally:
+                # 백그라운드 스레드의 DB 커넥션을 오래 잡고 있지 않는다
+                connection.close()
+
+    def flush(self):
+        with self._lock:
+            counts = self._counts
+            self._counts = defaultdict(int)
+        flushed = 0
+        try:
+            for product_id, amount in list(counts.items()):
+                increment_read_count(product_id, amount)
+                del counts[product_id]
+                flushed += 1
+        finally:
+            # 실패한 나머지는 다음 flush 때 다시 시도
+            if counts:
+                with self._lock:
+                    for product_id, amount in counts.items():
+                        self._counts[product_id] += amount
+        return flushed
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+
+read_count_buffer = ReadCountBuffer()
+
+# graceful shutdown 시 남은 조회수를 반영
+atexit.register(read_count_buffer.stop)
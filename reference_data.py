@@ -0,0 +1,79 @@
+import threading
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Product, ProductCategory, BabyAge
+
+
+class ReferenceData:
+    # 거의 바뀌지 않는 카테고리/아기나이/choice 값을 프로세스 단위로 캐시
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._generation = 0
+
+    def _load(self):
+        categories = dict(ProductCategory.objects.values_list('id', 'name'))
+        baby_ages = dict(BabyAge.objects.values_list('id', 'name'))
+        return {
+            'categories': categories,
+            'baby_ages': baby_ages,
+            'category_ids': frozenset(str(i) for i in categories),
+            'baby_age_ids': frozenset(str(i) for i in baby_ages),
+            'qualities': frozenset(str(c[0]) for c in Product.QUALITY_CHOICE),
+            'states': frozenset(str(c[0]) for c in Product.STATE_CHOICE),
+        }
+
+    def warm(self):
+        # 로드한 dict 를 돌려준다. 로드 중에 invalidate 되었다면 캐시에는 넣지 않는다
+        generation = self._generation
+        data = self._load()
+        with self._lock:
+            if generation == self._generation:
+                self._data = data
+        return data
+
+    def invalidate(self):
+        with self._lock:
+            self._data = None
+            self._generation += 1
+
+    def _get(self, key):
+        data = self._data
+        if data is None:
+            data = self.warm()
+        return data[key]
+
+    @property
+    def category_ids(self):
+        return self._get('category_ids')
+
+    @property
+    def baby_age_ids(self):
+        return self._get('baby_age_ids')
+
+    @property
+    def qualities(self):
+        return self._get('qualities')
+
+    @property
+    def states(self):
+        return self._get('states')
+
+    def category_name(self, category_id):
+        return self._get('categories').get(category_id)
+
+    def baby_age_name(self, baby_age_id):
+        return self._get('baby_ages').get(baby_age_id)
+
+
+reference_data = ReferenceData()
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=BabyAge)
+@receiver(post_delete, sender=BabyAge)
+def reference_data_changed(sender, **kwargs):
+    reference_data.invalidate()
@@ -0,0 +1,53 @@
+import decimal
+
+from django.db.models.fields.files import FieldFile
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    import json
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, FieldFile):
+        return obj.url if obj else None
+    # 그 외 (lazy 문자열, QuerySet 등) 는 DRF 기본 인코더 규칙을 따른다
+    return _encoder.default(obj)
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class CommonJSONRenderer(BaseRenderer):
+    # CommonResponse 의 {code, message, payload} 를 바로 bytes 로 직렬화
+    # settings.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] 맨 앞에 'api.renderers.CommonJSONRenderer' 로 등록
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data)
+
+
+class EventStreamRenderer(BaseRenderer):
+    # SSE 요청(Accept: text/event-stream) 이 content negotiation 에서 406 이 나지 않도록
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data)
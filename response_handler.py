@@ -1,9 +1,17 @@
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db.models import Q, prefetch_related_objects
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, parse_http_date_safe
 from rest_framework.settings import api_settings
 from rest_framework import status
 from rest_framework.response import Response
-from django.http import Http404
+from django.http import Http404, StreamingHttpResponse
+from .renderers import dumps
+from itertools import islice
+import base64
+import hashlib
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,7 +23,7 @@ class ResponseConstants:
 
 
 class CommonResponse(Response):
-    def __init__(self, status_code, message, data, code=None):
+    def __init__(self, status_code, message, data, code=None, etag=None, last_modified=None):
         if not code:
             code = '%s%s' % (str(status_code), '0000')
         response = {
@@ -24,6 +32,47 @@ class CommonResponse(Response):
             'payload': data
         }
         super().__init__(status=status_code, data=response)
+        set_validators(self, etag, last_modified)
+
+
+def make_etag(*parts):
+    # payload 를 직렬화하지 않고 id/modified_time/버전 값만으로 만드는 strong ETag
+    return '"%s"' % hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def set_validators(response, etag=None, last_modified=None):
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def not_modified(request, etag=None, last_modified=None):
+    # If-None-Match / If-Modified-Since 가 맞으면 304 응답, 아니면 None
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if etag and if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        if etag in tags or '*' in tags:
+            return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+        return None
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE') or '')
+    if last_modified and if_modified_since and int(last_modified.timestamp()) <= if_modified_since:
+        return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+    return None
+
+
+def rows_validators(request, rows, *parts, version=None):
+    # version(row): modified_time 을 건드리지 않고 바뀌는 값 (update() 카운터, 자식 row 등)
+    modified = [row.modified_time for row in rows if getattr(row, 'modified_time', None)]
+    last_modified = max(modified) if modified else None
+    etag = make_etag(request.get_full_path(), parts, [
+        (row.pk, getattr(row, 'modified_time', None), version(row) if version else None) for row in rows
+    ])
+    if version:
+        # 버전 값은 시각이 없으므로 If-Modified-Since 로는 판단할 수 없다
+        last_modified = None
+    return etag, last_modified
 
 
 def custom_paginator(request, queryset, serializer):
@@ -44,20 +93,120 @@ def custom_paginator(request, queryset, serializer):
             next_page = '{}?page={}'.format(base_url,
                                             page_results.next_page_number())
 
+        rows = list(page_results.object_list)
+        etag, last_modified = rows_validators(request, rows, p.count)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
         result = {
             'count': p.count,
             'previous': prev_page,
             'next': next_page
         }
         if serializer:
-            result['results'] = serializer(page_results.object_list, many=True,
+            result['results'] = serializer(rows, many=True,
                                            context={'request': request}).data
         else:
-            result['results'] = page_results.object_list
-        return CommonResponse(status.HTTP_200_OK, "요청에 성공했습니다.", result)
+            result['results'] = rows
+        return CommonResponse(status.HTTP_200_OK, "요청에 성공했습니다.", result, etag=etag,
+                              last_modified=last_modified)
     except EmptyPage:
         return CommonResponse(status.HTTP_404_NOT_FOUND, "존재하지 않는 페이지입니다.",
                               {'detail': 'Invalid page.'})
     except PageNotAnInteger:
         return CommonResponse(status.HTTP_404_NOT_FOUND, "유효하지 않은 페이지입니다.",
                               {'detail': 'Invalid page.'})
+
+
+def encode_cursor(value, pk, reverse=False):
+    raw = json.dumps({'v': value.isoformat(), 'id': pk, 'r': int(reverse)})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    value = parse_datetime(data['v'])
+    if value is None:
+        raise ValueError('invalid cursor')
+    return value, int(data['id']), bool(data.get('r'))
+
+
+def _keyset_filter(field, value, pk, descending):
+    op = 'lt' if descending else 'gt'
+    return Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': pk})
+
+
+def cursor_paginator(request, queryset, serializer, field='created_time', descending=True, version=None):
+    # (field, id) 기준 keyset 페이지네이션, COUNT 와 OFFSET 을 쓰지 않는다
+    base_url = request.build_absolute_uri().split('?')[0]
+    page_size = api_settings.PAGE_SIZE
+    cursor = request.query_params.get('cursor')
+    reverse = False
+    if cursor:
+        try:
+            value, pk, reverse = decode_cursor(cursor)
+        except (ValueError, KeyError, TypeError):
+            return CommonResponse(status.HTTP_404_NOT_FOUND, "유효하지 않은 커서입니다.",
+                                  {'detail': 'Invalid cursor.'})
+        # 이전 페이지는 반대 방향으로 읽은 뒤 뒤집는다
+        queryset = queryset.filter(_keyset_filter(field, value, pk, descending != reverse))
+
+    direction = descending != reverse
+    order = ('-' if direction else '') + field
+    order_id = ('-' if direction else '') + 'id'
+    rows = list(queryset.order_by(order, order_id)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    prev_page = None
+    next_page = None
+    if rows:
+        first, last = rows[0], rows[-1]
+        if (has_more if reverse else bool(cursor)):
+            prev_page = '{}?cursor={}'.format(base_url, encode_cursor(getattr(first, field), first.id, True))
+        if (bool(cursor) if reverse else has_more):
+            next_page = '{}?cursor={}'.format(base_url, encode_cursor(getattr(last, field), last.id))
+
+    etag, last_modified = rows_validators(request, rows, prev_page, next_page, version=version)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+
+    result = {
+        'previous': prev_page,
+        'next': next_page
+    }
+    if serializer:
+        result['results'] = serializer(rows, many=True, context={'request': request}).data
+    else:
+        result['results'] = rows
+    return CommonResponse(status.HTTP_200_OK, "요청에 성공했습니다.", result, etag=etag,
+                          last_modified=last_modified)
+
+
+def stream_response(request, queryset, serializer, chunk_size=200):
+    # 전체 queryset 을 메모리에 올리지 않고 chunk 단위로 직렬화해서 내려준다
+
+    def generate():
+        yield b'{"code":"%d0000","message":%s,"payload":[' % (
+            status.HTTP_200_OK, dumps(ResponseConstants.DEFAULT_SUCCESS_MESSAGE))
+        # Django < 4.1 의 iterator() 는 prefetch_related 를 조용히 무시하므로 chunk 마다 직접 prefetch 한다
+        lookups = queryset._prefetch_related_lookups
+        rows = queryset.prefetch_related(None).iterator(chunk_size=chunk_size)
+        first = True
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            if lookups:
+                prefetch_related_objects(chunk, *lookups)
+            for item in serializer(chunk, many=True, context={'request': request}).data:
+                yield (b'' if first else b',') + dumps(item)
+                first = False
+        yield b']}'
+
+    return StreamingHttpResponse(generate(), status=status.HTTP_200_OK, content_type='application/json')
@@ -1,24 +1,114 @@
 from rest_framework import serializers
+from django.db.models import Prefetch
 from .models import Profile, ChatRoom, ChatMessage, Notice
 from django.contrib.auth.models import User
 from .models import Product, ProductCategory, ProductImage, BabyAge, Transaction, Area, TempProfile, \
     RelationShip
+from .reference_data import reference_data
+from .chat_sync import room_participants
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    # GET ?fields=id,title&expand=seller
+    # fields 에 없는 필드는 직렬화하지 않고, sparse_queryset 으로 SELECT 컬럼도 줄인다
+    expandable_fields = {}
+    source_fields = {}  # 직렬화 필드 -> 필요한 모델 필드
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, expand = self.requested(self.context.get('request'))
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+        for name in expand:
+            if name in self.expandable_fields and name in self.fields:
+                self.fields[name] = self.expandable_fields[name](read_only=True)
+
+    @staticmethod
+    def _param(request, key):
+        if request is None or request.method != 'GET':
+            return None
+        value = request.query_params.get(key)
+        if not value:
+            return None
+        return {v.strip() for v in value.split(',') if v.strip()}
+
+    @classmethod
+    def requested(cls, request):
+        return cls._param(request, 'fields'), cls._param(request, 'expand') or set()
+
+    @classmethod
+    def sparse_queryset(cls, queryset, request):
+        fields, expand = cls.requested(request)
+        expand = {name for name in expand if name in cls.expandable_fields}
+        if fields is not None:
+            expand &= fields
+            model_fields = {f.name for f in cls.Meta.model._meta.concrete_fields}
+            # 페이지네이션 커서와 ETag 계산에 쓰는 컬럼은 항상 포함
+            names = {'id', 'created_time', 'modified_time'}
+            for name in fields:
+                names.update(cls.source_fields.get(name, (name,)))
+            queryset = queryset.only(*[name for name in names if name in model_fields])
+        if expand:
+            queryset = queryset.select_related(*expand)
+        return queryset
+
+    @classmethod
+    def wants(cls, request, name):
+        fields = cls._param(request, 'fields')
+        return fields is None or name in fields
+
+
+class ProfileSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Profile
+        fields = ('id', 'name', 'image', 'area')
+
+
+class ProductSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ('id', 'title', 'price', 'state')
+
+
+class ProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    stamps_count = serializers.IntegerField(source='recommend_count', read_only=True)
+    source_fields = {'stamps_count': ('recommend_count',), 'friends': ()}
+
     class Meta:
         model = Profile
         extra_kwargs = {
             'fcm_token': {'write_only': True},
             'app_version': {'write_only': True},
             'platform': {'write_only': True},
+            # score_sum / review_count 로 counters.py 가 유지하는 값
+            'score': {'read_only': True},
         }
         fields = ('id', 'owner', 'name', 'area', 'fcm_token', 'app_version', 'platform',
                   'image', 'friends', 'phone_number', 'score', 'stamps_count')
 
+    def update(self, instance, validated_data):
+        # 전체 save() 는 F() 로 갱신된 카운터를 읽어둔 옛 값으로 덮어쓰므로 바뀐 컬럼만 저장
+        concrete = {f.name for f in Profile._meta.concrete_fields}
+        update_fields = {'modified_time'}
+        for name, value in validated_data.items():
+            if name in concrete:
+                setattr(instance, name, value)
+                update_fields.add(name)
+        instance.save(update_fields=update_fields)
+        return instance
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, request=None):
+        # 여러 profile 을 직렬화할 때 profile 마다 friends 쿼리가 나가지 않도록
+        queryset = cls.sparse_queryset(queryset, request)
+        if not cls.wants(request, 'friends'):
+            return queryset
+        return queryset.prefetch_related(Prefetch('friends', queryset=Profile.objects.only('id')))
+
 
 class ProductCategorySerializers(serializers.ModelSerializer):
     class Meta:
@@ -32,11 +122,30 @@ class BabyAgeSerializers(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ProductSerializers(serializers.ModelSerializer):
+class ProductSerializers(SparseFieldsMixin, serializers.ModelSerializer):
+    category_name = serializers.SerializerMethodField()
+    start_baby_age_name = serializers.SerializerMethodField()
+    end_baby_age_name = serializers.SerializerMethodField()
+    expandable_fields = {'seller': ProfileSummarySerializer}
+    source_fields = {
+        'category_name': ('category',),
+        'start_baby_age_name': ('start_baby_age',),
+        'end_baby_age_name': ('end_baby_age',),
+    }
+
     class Meta:
         model = Product
         fields = '__all__'
 
+    def get_category_name(self, obj):
+        return reference_data.category_name(obj.category_id)
+
+    def get_start_baby_age_name(self, obj):
+        return reference_data.baby_age_name(obj.start_baby_age_id)
+
+    def get_end_baby_age_name(self, obj):
+        return reference_data.baby_age_name(obj.end_baby_age_id)
+
     def is_valid(self, raise_exception=False):
         attrs = self.initial_data
 
@@ -46,22 +155,20 @@ class ProductSerializers(serializers.ModelSerializer):
             if field not in attrs.keys():
                 self._errors = {'error': f'{field} is essential field'}
                 return False
-        category_ids = list(ProductCategory.objects.all().values_list('id', flat=True))
-        if attrs['category'] not in [str(id) for id in category_ids]:
+        if str(attrs['category']) not in reference_data.category_ids:
             self._errors = {'error': 'category field out of range'}
             return False
-        baby_age_ids = list(BabyAge.objects.all().values_list('id', flat=True))
-        if attrs['start_baby_age'] not in [str(id) for id in baby_age_ids]:
+        if str(attrs['start_baby_age']) not in reference_data.baby_age_ids:
             self._errors = {'error': 'start_baby_age field out of range'}
             return False
-        if attrs['end_baby_age'] not in [str(id) for id in baby_age_ids]:
+        if str(attrs['end_baby_age']) not in reference_data.baby_age_ids:
             self._errors = {'error': 'end_baby_age field out of range'}
             return False
-        if attrs['quality'] not in [str(c[0]) for c in Product.QUALITY_CHOICE]:
+        if str(attrs['quality']) not in reference_data.qualities:
             self._errors = {'error': 'quality field out of range'}
             return False
 
-        if attrs['state'] not in [str(c[0]) for c in Product.STATE_CHOICE]:
+        if str(attrs['state']) not in reference_data.states:
             self._errors = {'error': 'state field out of range'}
             return False
 
@@ -104,6 +211,98 @@ class ProductSerializers(serializers.ModelSerializer):
         return instance
 
 
+class ProductFeedSerializer:
+    # 피드 목록 전용 읽기 전용 직렬화. ModelSerializer 의 필드 introspection 과 validation 을 거치지 않는다
+    # SparseFieldsMixin 과 같은 ?fields= / ?expand=seller 를 받는다
+    source_fields = {
+        'id': ('id',),
+        'title': ('title',),
+        'price': ('price',),
+        'state': ('state',),
+        'quality': ('quality',),
+        'area': ('area',),
+        'seller': ('seller',),
+        'category': ('category',),
+        'category_name': ('category',),
+        'start_baby_age': ('start_baby_age',),
+        'end_baby_age': ('end_baby_age',),
+        'read_count': ('read_count',),
+        'chat_count': ('chat_count',),
+        'created_time': ('created_time',),
+        'modified_time': ('modified_time',),
+        'images': (),
+    }
+    expandable_fields = {'seller': ProfileSummarySerializer}
+
+    def __init__(self, instance=None, many=False, context=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        self.selected, self.expand = self.requested(self.context.get('request'))
+
+    @classmethod
+    def requested(cls, request):
+        fields, expand = SparseFieldsMixin.requested(request)
+        selected = [name for name in cls.source_fields if fields is None or name in fields]
+        expand = {name for name in expand if name in cls.expandable_fields and name in selected}
+        return selected, expand
+
+    @classmethod
+    def setup_queryset(cls, queryset, request=None):
+        selected, expand = cls.requested(request)
+        # 페이지네이션 커서와 ETag 계산에 쓰는 컬럼은 항상 포함
+        names = {'id', 'created_time', 'modified_time'}
+        for name in selected:
+            names.update(cls.source_fields[name])
+        queryset = queryset.only(*names)
+        if expand:
+            queryset = queryset.select_related(*expand)
+        if 'images' in selected:
+            images = ProductImage.objects.only('id', 'product_id', 'image')
+            queryset = queryset.prefetch_related(Prefetch('product_images', queryset=images))
+        return queryset
+
+    @classmethod
+    def versioner(cls, request):
+        # 카운터는 update() 로, 이미지는 ProductImage insert 로 바뀌어서 Product.modified_time 에 남지 않는다
+        # 로드하지 않은 (deferred) 컬럼은 건드리지 않도록 선택된 필드만 본다
+        selected, expand = cls.requested(request)
+        counters = [name for name in ('read_count', 'chat_count') if name in selected]
+        images = 'images' in selected
+
+        def version(product):
+            return (tuple(getattr(product, name) for name in counters),
+                    [(i.id, i.image.name) for i in product.product_images.all()] if images else None)
+        return version
+
+    def image_url(self, image):
+        if not image:
+            return None
+        url = image.url
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def field_value(self, product, name):
+        if name == 'seller' and name in self.expand:
+            return ProfileSummarySerializer(product.seller, context=self.context).data if product.seller_id else None
+        if name in ('area', 'seller', 'category', 'start_baby_age', 'end_baby_age'):
+            return getattr(product, name + '_id')
+        if name == 'category_name':
+            return reference_data.category_name(product.category_id)
+        if name == 'images':
+            return [self.image_url(i.image) for i in product.product_images.all() if i.image]
+        return getattr(product, name)
+
+    def to_representation(self, product):
+        return {name: self.field_value(product, name) for name in self.selected}
+
+    @property
+    def data(self):
+        if self.many:
+            return [self.to_representation(product) for product in self.instance]
+        return self.to_representation(self.instance)
+
+
 class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
@@ -151,11 +350,32 @@ class TransactionSerializer(serializers.ModelSerializer):
         return transaction
 
 
-class ChatRoomSerializer(serializers.ModelSerializer):
+class ChatMessageSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChatMessage
+        fields = ('id', 'num', 'sender', 'content', 'created_time')
+
+
+class ChatRoomSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    last_message = ChatMessageSummarySerializer(read_only=True)
+    unread_count = serializers.SerializerMethodField()
+    expandable_fields = {
+        'seller': ProfileSummarySerializer,
+        'buyer': ProfileSummarySerializer,
+        'product': ProductSummarySerializer,
+    }
+    source_fields = {'unread_count': ('seller', 'last_num', 'seller_last_num', 'buyer_last_num')}
+
     class Meta:
         model = ChatRoom
         fields = '__all__'
 
+    def get_unread_count(self, obj):
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return None
+        return obj.unread_count(request.user.profile.id)
+
     def is_valid(self, raise_exception=False):
         attrs = self.initial_data
 
@@ -208,23 +428,22 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         if not attrs['content']:
             self._errors = {'error': 'content is empty'}
             return False
-        # Check Room Id
-        try:
-            chat_room = ChatRoom.objects.get(id=room_id)
-            attrs['room'] = chat_room
-        except ChatRoom.DoesNotExist as e:
+        # Check Room Id and membership (cached room -> participants)
+        request = self.context['request']
+        if not room_participants.is_member(room_id, request.user.profile.id):
             self._errors = {'error': 'room_id does not exist'}
             return False
 
         self._errors = {}
-        self._validated_data = attrs
+        self._validated_data = {'room_id': room_id, 'content': attrs['content']}
         return True
 
     def create(self, validated_data):
         request = self.context['request']
 
+        # save() 에서 num 할당과 방의 last_message/modified_time 갱신이 같은 트랜잭션으로 처리된다
         chat_message = ChatMessage(
-            room=validated_data['room'],
+            room_id=validated_data['room_id'],
             sender=request.user.profile,
             content=validated_data['content']
         )
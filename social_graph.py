@@ -0,0 +1,138 @@
+import threading
+import time
+from array import array
+
+from django.conf import settings
+
+from .models import Profile, RelationShip
+
+SOCIAL_GRAPH_TTL = getattr(settings, 'SOCIAL_GRAPH_TTL', 60 * 10)  # second
+SOCIAL_GRAPH_MAX_HOPS = getattr(settings, 'REACHABILITY_MAX_HOPS', 3)
+
+
+def _csr(n, pairs):
+    # pairs 는 src 기준으로 정렬되어 있어야 한다
+    offsets = array('i', [0]) * (n + 1)
+    targets = array('i')
+    for src, dst in pairs:
+        offsets[src + 1] += 1
+        targets.append(dst)
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+    return offsets, targets
+
+
+class SocialGraph:
+    # RelationShip(subject -> object) 를 정수 인덱스의 CSR 배열로 들고 있는다
+    def __init__(self, ids, active, edges):
+        self.ids = array('l', ids)
+        self.index = {profile_id: i for i, profile_id in enumerate(ids)}
+        self.active = bytearray(active)
+        n = len(ids)
+        edges = [(self.index[s], self.index[o]) for s, o in edges if s in self.index and o in self.index]
+        edges.sort()
+        self.out_offsets, self.out_targets = _csr(n, edges)
+        reverse = sorted((o, s) for s, o in edges)
+        self.in_offsets, self.in_targets = _csr(n, reverse)
+        self.loaded_at = time.time()
+
+    @classmethod
+    def load(cls):
+        ids = []
+        active = []
+        for profile_id, is_app_user in Profile.objects.values_list('id', 'is_app_user').order_by('id').iterator():
+            ids.append(profile_id)
+            active.append(1 if is_app_user else 0)
+        edges = RelationShip.objects.values_list('subject_id', 'object_id').iterator()
+        return cls(ids, active, edges)
+
+    @classmethod
+    def load_around(cls, profile_id, max_hops=SOCIAL_GRAPH_MAX_HOPS, bridge_depth=1):
+        # profile_id 에서 max_hops 안의 부분 그래프만 로드 (증분 재계산용)
+        # max_hops - 1 거리까지의 앱 사용자 연락처와 bridge 대상 비회원 연락처의 역방향 관계를 담는다
+        active = {profile_id: 0}
+        edges = set()
+        frontier = {profile_id}
+        seen = {profile_id}
+        for hop in range(1, max_hops + 1):
+            next_ids = set()
+            inactive = set()
+            for subject_id, object_id, is_app_user in RelationShip.objects.filter(subject_id__in=frontier) \
+                    .values_list('subject_id', 'object_id', 'object__is_app_user'):
+                edges.add((subject_id, object_id))
+                active[object_id] = 1 if is_app_user else 0
+                if is_app_user:
+                    next_ids.add(object_id)
+                elif hop <= bridge_depth:
+                    inactive.add(object_id)
+            if inactive:
+                for subject_id, object_id, is_app_user in RelationShip.objects.filter(object_id__in=inactive) \
+                        .values_list('subject_id', 'object_id', 'subject__is_app_user'):
+                    edges.add((subject_id, object_id))
+                    active[subject_id] = 1 if is_app_user else 0
+                    if is_app_user:
+                        next_ids.add(subject_id)
+            frontier = next_ids - seen
+            seen.update(frontier)
+            if not frontier:
+                break
+        ids = sorted(active)
+        return cls(ids, [active[i] for i in ids], edges)
+
+    def out(self, i):
+        return self.out_targets[self.out_offsets[i]:self.out_offsets[i + 1]]
+
+    def incoming(self, i):
+        return self.in_targets[self.in_offsets[i]:self.in_offsets[i + 1]]
+
+    def reachable(self, profile_id, max_hops=SOCIAL_GRAPH_MAX_HOPS, bridge_depth=1):
+        # 앱 사용자만 따라가고, 비회원 연락처는 bridge_depth 이내에서만
+        # 같은 번호를 가진 다른 앱 사용자로 한 hop 건너간다.
+        # 반환값: [(profile_id, hops, mutual)] hops 오름차순, 연결 수 내림차순
+        root = self.index.get(profile_id)
+        if root is None:
+            return []
+        visited = {root}
+        result = []
+        frontier = [root]
+        carry = {}
+        for hop in range(1, max_hops + 1):
+            counts = carry
+            carry = {}
+            for node in frontier:
+                for j in self.out(node):
+                    if self.active[j]:
+                        counts[j] = counts.get(j, 0) + 1
+                    elif hop <= bridge_depth:
+                        for k in self.incoming(j):
+                            if self.active[k]:
+                                carry[k] = carry.get(k, 0) + 1
+            frontier = [j for j in counts if j not in visited]
+            visited.update(frontier)
+            frontier.sort(key=lambda j: -counts[j])
+            result.extend((self.ids[j], hop, counts[j]) for j in frontier)
+            if not frontier and not carry:
+                break
+        return result
+
+    def reachable_ids(self, profile_id, max_hops=SOCIAL_GRAPH_MAX_HOPS):
+        return {profile_id: hops for profile_id, hops, mutual in self.reachable(profile_id, max_hops)}
+
+    def suggest_friends(self, profile_id, limit=20):
+        # 직접 연락처가 아닌 2 hop 이상 앱 사용자를 함께 아는 친구 수 순으로
+        suggestions = [r for r in self.reachable(profile_id, max_hops=2) if r[1] >= 2]
+        suggestions.sort(key=lambda r: -r[2])
+        return [profile_id for profile_id, hops, mutual in suggestions[:limit]]
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_graph():
+    global _graph
+    if _graph is None or time.time() - _graph.loaded_at > SOCIAL_GRAPH_TTL:
+        with _graph_lock:
+            if _graph is None or time.time() - _graph.loaded_at > SOCIAL_GRAPH_TTL:
+                _graph = SocialGraph.load()
+    return _graph
@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def assert_constant_query_count(run, sizes=(1, 50)):
+    # run(size) 가 size 와 관계없이 같은 수의 쿼리를 내야 한다
+    counts = {}
+    queries = {}
+    for size in sizes:
+        with CaptureQueriesContext(connection) as captured:
+            run(size)
+        counts[size] = len(captured)
+        queries[size] = captured.captured_queries
+    if len(set(counts.values())) > 1:
+        largest = max(sizes)
+        sql = '\n'.join(query['sql'] for query in queries[largest])
+        raise AssertionError(f'query count depends on row count: {counts}\n{sql}')
+    return counts
+
+
+def assert_constant_queries(build_qs, serializer, sizes=(1, 50), context=None):
+    # row 수와 관계없이 직렬화 쿼리 수가 같아야 한다 (N+1 검사). sizes 만큼의 row 가 미리 있어야 한다
+    # 예) assert_constant_queries(lambda: ProfileSerializer.setup_eager_loading(Profile.objects.all()),
+    #                             ProfileSerializer)
+    def run(size):
+        rows = list(build_qs()[:size])
+        if len(rows) != size:
+            raise AssertionError(f'need at least {size} rows, found {len(rows)}')
+        serializer(rows, many=True, context=context or {}).data
+
+    return assert_constant_query_count(run, sizes)
+
+
+class FakeSGISServer:
+    # 로컬에서 뜨는 가짜 SGIS. auth/rgeocode 호출 수를 세고, expire_tokens() 후에는 발급한 토큰을 -401 로 거절한다
+    # with FakeSGISServer() as sgis:
+    #     manager = SGISTokenManager('key', 'secret', base_url=sgis.base_url)
+    def __init__(self):
+        self.auth_calls = 0
+        self.rgeocode_calls = 0
+        # rgeocode 가 돌려줄 result, [] 로 바꾸면 행정구역이 없는 좌표처럼 응답한다
+        self.results = [{
+            'adm_dr_cd': '1111051500',
+            'sido_nm': '서울특별시',
+            'sgg_nm': '종로구',
+            'emdong_nm': '청운효자동',
+        }]
+        self._tokens = set()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def expire_tokens(self):
+        with self._lock:
+            self._tokens.clear()
+
+    def _auth(self, params):
+        with self._lock:
+            self.auth_calls += 1
+            token = f'token-{self.auth_calls}'
+            self._tokens.add(token)
+        return {'errCd': 0, 'result': {
+            'accessToken': token,
+            'accessTimeout': str(int((time.time() + 60 * 60 * 4) * 1000)),
+        }}
+
+    def _rgeocode(self, params):
+        with self._lock:
+            self.rgeocode_calls += 1
+            valid = params.get('accessToken', [None])[0] in self._tokens
+        if not valid:
+            return {'errCd': -401, 'errMsg': '인증 정보가 존재하지 않습니다'}
+        return {'errCd': 0, 'result': self.results}
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+                if url.path.endswith('/auth/authentication.json'):
+                    body = fake._auth(params)
+                elif url.path.endswith('/addr/rgeocode.json'):
+                    body = fake._rgeocode(params)
+                else:
+                    self.send_error(404)
+                    return
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json;charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
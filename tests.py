@@ -0,0 +1,566 @@
+import gzip
+import json
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.serializers import Serializer, IntegerField, SerializerMethodField
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import chat_archive, location, read_counter, views
+from .chat_archive import archive_batch, archive_paginator, read_archived
+from .chat_broker import broker
+from .chat_sync import append_messages, mark_read, sync_rooms
+from .contact_sync import sync_contacts
+from .geocode_cache import GeocodeCache
+from .location import SGISTokenManager
+from .models import Profile, RelationShip, PendingReachabilityRebuild, ChatRoom, ChatMessage, ChatArchiveSegment, \
+    Transaction
+from .phone_index import PhoneIndex, BloomFilter
+from .product_cache import ProductDetailCache
+from .response_handler import cursor_paginator, stream_response
+from .serializers import ProfileSerializer, ChatMessageSerializer
+from .testing import FakeSGISServer, assert_constant_queries, assert_constant_query_count
+
+
+class ProfileSerializerQueryTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        profiles = [Profile.objects.create(owner=User.objects.create(username=f'user{i}'), is_app_user=True)
+                    for i in range(50)]
+        for subject, friend in zip(profiles, profiles[1:] + profiles[:1]):
+            RelationShip.objects.create(subject=subject, object=friend, object_name='friend')
+
+    def test_profile_list_queries_do_not_grow_with_rows(self):
+        assert_constant_queries(
+            lambda: ProfileSerializer.setup_eager_loading(Profile.objects.order_by('id')),
+            ProfileSerializer,
+        )
+
+
+class SGISTokenManagerTest(SimpleTestCase):
+
+    def setUp(self):
+        self.sgis = FakeSGISServer().start()
+        self.addCleanup(self.sgis.stop)
+        http = requests.Session()
+        self.addCleanup(http.close)
+        manager = SGISTokenManager('key', 'secret', base_url=self.sgis.base_url, http=http)
+        patcher = mock.patch.object(location, 'token_manager', manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_geocodes_share_one_auth_call(self):
+        for _ in range(20):
+            self.assertEqual(location.rgeocode(953000, 1952000)['errCd'], 0)
+        self.assertEqual(self.sgis.auth_calls, 1)
+        self.assertEqual(self.sgis.rgeocode_calls, 20)
+
+    def test_concurrent_geocodes_share_one_auth_call(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda i: location.rgeocode(953000, 1952000), range(40)))
+        self.assertTrue(all(con['errCd'] == 0 for con in results))
+        self.assertEqual(self.sgis.auth_calls, 1)
+
+    def test_empty_result_is_a_failure_not_an_error(self):
+        self.sgis.results = []
+        result = location.sgis_location_utmk(953000, 1952000)
+        self.assertNotIsInstance(result, dict)
+
+    def test_expired_token_is_refreshed_once(self):
+        location.rgeocode(953000, 1952000)
+        self.sgis.expire_tokens()
+        con = location.rgeocode(953000, 1952000)
+        self.assertEqual(con['errCd'], 0)
+        self.assertEqual(self.sgis.auth_calls, 2)
+        # 첫 호출 + -401 로 거절된 호출 + 재발급 후 재시도
+        self.assertEqual(self.sgis.rgeocode_calls, 3)
+        for _ in range(5):
+            location.rgeocode(953000, 1952000)
+        self.assertEqual(self.sgis.auth_calls, 2)
+
+
+def make_profile(username, phone_number=None, is_app_user=True):
+    return Profile.objects.create(owner=User.objects.create(username=username), phone_number=phone_number,
+                                  is_app_user=is_app_user)
+
+
+class ContactSyncTest(TestCase):
+
+    def setUp(self):
+        self.subject = make_profile('subject', '01000000000')
+
+    def test_import_queries_do_not_grow_with_contacts(self):
+        def run(size):
+            numbers = [f'0109{size:03d}{i:04d}' for i in range(size)]
+            sync_contacts(self.subject, numbers, ['friend'] * size)
+
+        assert_constant_query_count(run, sizes=(5, 50))
+
+    def test_import_queues_only_affected_app_users(self):
+        # holder 는 비회원 B 를 이미 가지고 있어서 subject 가 B 를 추가하면 bridge 로 subject 에 닿는다
+        holder = make_profile('holder', '01011111111')
+        inactive = make_profile('inactive', '01022222222', is_app_user=False)
+        RelationShip.objects.create(subject=holder, object=inactive, object_name='B')
+        bystander = make_profile('bystander', '01033333333')
+        PendingReachabilityRebuild.objects.all().delete()
+
+        result = sync_contacts(self.subject, ['010-2222-2222', '010-4444-4444'], ['B', 'new'])
+
+        self.assertEqual(result['created'], 1)
+        pending = set(PendingReachabilityRebuild.objects.values_list('profile_id', flat=True))
+        self.assertEqual(pending, {self.subject.id, holder.id})
+        self.assertNotIn(bystander.id, pending)
+
+
+class ProfileDeferredFieldsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(50):
+            make_profile(f'user{i}')
+
+    def test_loading_profiles_with_deferred_is_app_user_does_not_refresh(self):
+        # reachability 의 post_init 핸들러가 deferred 컬럼을 읽으면 row 마다 쿼리가 나간다
+        assert_constant_query_count(lambda size: list(Profile.objects.only('id')[:size]), sizes=(1, 50))
+
+
+def page_size(size):
+    return override_settings(REST_FRAMEWORK={**getattr(settings, 'REST_FRAMEWORK', {}), 'PAGE_SIZE': size})
+
+
+class ChatArchiveTest(TestCase):
+
+    def setUp(self):
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir, ignore_errors=True)
+        patcher = mock.patch.object(chat_archive, 'CHAT_ARCHIVE_DIR', archive_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings_patch = page_size(5)
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+
+        self.room = ChatRoom.objects.create()
+        self.messages = [ChatMessage.objects.create(room=self.room, content=f'message {i}', readers='')
+                         for i in range(12)]
+        # 0~3, 4~7 은 서로 다른 달의 segment 로, 8~11 은 DB 에 남는다
+        now = timezone.now()
+        ids = [m.id for m in self.messages]
+        ChatMessage.objects.filter(id__in=ids[:4]).update(created_time=now - timedelta(days=430))
+        ChatMessage.objects.filter(id__in=ids[4:8]).update(created_time=now - timedelta(days=370))
+        self.assertEqual(archive_batch(now - timedelta(days=180)), 8)
+
+    def page(self, url='/chat/'):
+        params = {key: values[0] for key, values in parse_qs(urlparse(url or '').query).items()}
+        response = archive_paginator(Request(APIRequestFactory().get('/chat/', params)), self.room.id,
+                                     ChatMessageSerializer)
+        payload = response.data['payload']
+        return [row['id'] for row in payload['results']], payload['previous'], payload['next']
+
+    def ids(self, start, stop):
+        return [m.id for m in self.messages[start:stop]]
+
+    def test_forward_cursor_crosses_archive_into_db(self):
+        self.assertEqual(ChatMessage.objects.filter(room=self.room).count(), 4)
+        rows, previous, next_page = self.page()
+        self.assertEqual(rows, self.ids(0, 5))
+        self.assertIsNone(previous)
+        rows, previous, next_page = self.page(next_page)
+        self.assertEqual(rows, self.ids(5, 10))
+        self.assertIsNotNone(previous)
+        rows, previous, next_page = self.page(next_page)
+        self.assertEqual(rows, self.ids(10, 12))
+        self.assertIsNone(next_page)
+
+    def test_backward_cursor_crosses_db_into_archive(self):
+        _, _, next_page = self.page()
+        _, _, next_page = self.page(next_page)
+        _, previous, _ = self.page(next_page)
+        rows, previous, next_page = self.page(previous)
+        self.assertEqual(rows, self.ids(5, 10))
+        self.assertIsNotNone(next_page)
+        rows, previous, next_page = self.page(previous)
+        self.assertEqual(rows, self.ids(0, 5))
+        self.assertIsNone(previous)
+
+    def test_truncated_segment_tail_keeps_earlier_rows(self):
+        segment = ChatArchiveSegment.objects.filter(room=self.room).order_by('first_id').last()
+        member = gzip.compress(b'{"id": 999999}\n')
+        with open(segment.path, 'ab') as f:
+            f.write(member[:len(member) // 2])
+        self.assertEqual([m.id for m in read_archived(self.room.id)], self.ids(0, 8))
+
+        # 잘린 segment 에 다음 batch 가 붙어도 새 row 가 읽혀야 한다
+        message = ChatMessage.objects.create(room=self.room, content='late', readers='')
+        ChatMessage.objects.filter(id=message.id).update(created_time=self.messages[7].created_time)
+        ChatMessage.objects.create(room=self.room, content='last', readers='')
+        archive_batch(timezone.now() - timedelta(days=180))
+        self.assertEqual([m.id for m in read_archived(self.room.id)], self.ids(0, 8) + [message.id])
+
+
+class PhoneIndexTest(SimpleTestCase):
+
+    def test_expired_index_is_reloaded_once_under_concurrency(self):
+        index = PhoneIndex(capacity=100, ttl=60)
+        calls = []
+
+        def reload():
+            calls.append(1)
+            time.sleep(0.05)
+            index._bloom = BloomFilter(100, 0.01)
+            index._loaded_at = time.time()
+
+        with mock.patch.object(index, 'reload', side_effect=reload):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(lambda i: index._get(), range(16)))
+        self.assertEqual(len(calls), 1)
+
+
+class ChatStreamTest(TransactionTestCase):
+    # 뷰가 스트림 전에 connection.close() 를 하므로 TestCase 의 트랜잭션 대신 TransactionTestCase 를 쓴다
+
+    def setUp(self):
+        self.profile = make_profile('seller')
+        self.room = ChatRoom.objects.create(seller=self.profile)
+        self.messages = [ChatMessage.objects.create(room=self.room, sender=self.profile, content=f'm{i}', readers='')
+                         for i in range(4)]
+        for name, value in (('CHAT_STREAM_TIMEOUT', 0), ('CHAT_STREAM_HEARTBEAT', 0.05)):
+            patcher = mock.patch.object(views, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stream(self, params=None, **headers):
+        request = APIRequestFactory().get(f'/chat/{self.room.id}/stream/', params or {}, **headers)
+        force_authenticate(request, user=self.profile.owner)
+        response = views.ChatStreamView.as_view()(request, room_id=self.room.id)
+        self.addCleanup(response.close)
+        return response
+
+    def event_ids(self, content):
+        return [int(i) for i in re.findall(rb'^id: (\d+)$', content, re.M)]
+
+    def test_since_replays_missed_messages(self):
+        content = b''.join(self.stream({'since': self.messages[1].id}).streaming_content)
+        self.assertEqual(self.event_ids(content), [m.id for m in self.messages[2:]])
+        self.assertNotIn(b'retry: 0', content)
+
+    def test_last_event_id_replays_missed_messages(self):
+        content = b''.join(self.stream(HTTP_LAST_EVENT_ID=str(self.messages[0].id)).streaming_content)
+        self.assertEqual(self.event_ids(content), [m.id for m in self.messages[1:]])
+
+    def test_gap_larger_than_a_page_is_truncated_with_retry(self):
+        with page_size(2):
+            content = b''.join(self.stream({'since': 0}).streaming_content)
+        self.assertEqual(self.event_ids(content), [m.id for m in self.messages[:2]])
+        self.assertTrue(content.endswith(b'retry: 0\n\n'))
+
+    def test_published_message_reaches_open_stream(self):
+        with mock.patch.object(views, 'CHAT_STREAM_TIMEOUT', 5):
+            response = self.stream()
+            chunks = iter(response.streaming_content)
+            # 처음 접속은 지금부터만 받으므로 구독 후 저장된 메시지가 첫 이벤트여야 한다
+            message = ChatMessage.objects.create(room=self.room, sender=self.profile, content='live', readers='')
+            chunk = next(chunks)
+            while chunk.startswith(b':'):
+                chunk = next(chunks)
+        self.assertEqual(self.event_ids(chunk), [message.id])
+        response.close()
+        self.assertNotIn(self.room.id, broker._subscribers)
+
+
+class CursorPaginatorTest(TestCase):
+
+    def setUp(self):
+        settings_patch = page_size(2)
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+        self.seller = make_profile('seller')
+        transactions = [Transaction.objects.create(seller=self.seller) for _ in range(5)]
+        # 같은 created_time 은 id 로 순서가 정해진다
+        now = timezone.now()
+        for i, row in enumerate(transactions):
+            Transaction.objects.filter(id=row.id).update(created_time=now - timedelta(minutes=i // 2))
+        # 최신순: created_time desc, id desc
+        self.expected = [row.id for row in Transaction.objects.order_by('-created_time', '-id')]
+
+    def page(self, url=None):
+        params = {key: values[0] for key, values in parse_qs(urlparse(url or '').query).items()}
+        request = Request(APIRequestFactory().get('/sell-history/', params))
+        payload = cursor_paginator(request, Transaction.objects.filter(seller=self.seller), None).data['payload']
+        return [row.id for row in payload['results']], payload['previous'], payload['next']
+
+    def test_next_walks_all_rows_once(self):
+        rows, previous, next_page = self.page()
+        self.assertIsNone(previous)
+        seen = rows
+        while next_page:
+            rows, previous, next_page = self.page(next_page)
+            self.assertIsNotNone(previous)
+            seen += rows
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_returns_the_same_pages_backwards(self):
+        pages = []
+        rows, previous, next_page = self.page()
+        pages.append(rows)
+        while next_page:
+            rows, previous, next_page = self.page(next_page)
+            pages.append(rows)
+        backwards = []
+        while previous:
+            rows, previous, next_page = self.page(previous)
+            self.assertIsNotNone(next_page)
+            backwards.append(rows)
+        self.assertEqual(backwards, pages[-2::-1])
+
+
+class ChatMessageSequenceTest(TestCase):
+
+    def setUp(self):
+        self.seller = make_profile('seller')
+        self.buyer = make_profile('buyer')
+        self.room = ChatRoom.objects.create(seller=self.seller, buyer=self.buyer)
+        self.other = ChatRoom.objects.create(seller=self.seller, buyer=self.buyer)
+
+    def nums(self, room):
+        return list(ChatMessage.objects.filter(room=room).order_by('id').values_list('num', flat=True))
+
+    def test_num_is_contiguous_across_save_and_batch(self):
+        ChatMessage.objects.create(room=self.room, sender=self.buyer, content='a', readers='')
+        append_messages(self.seller, [(self.room.id, 'b'), (self.other.id, 'x'), (self.room.id, 'c')])
+        ChatMessage.objects.create(room=self.room, sender=self.buyer, content='d', readers='')
+        append_messages(self.buyer, [(self.room.id, 'e')])
+
+        self.assertEqual(self.nums(self.room), [1, 2, 3, 4, 5])
+        self.assertEqual(self.nums(self.other), [1])
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.last_num, 5)
+
+    def test_last_message_and_modified_time_follow_new_messages(self):
+        before = ChatRoom.objects.get(id=self.room.id).modified_time
+        message = ChatMessage.objects.create(room=self.room, sender=self.buyer, content='a', readers='')
+        room = ChatRoom.objects.get(id=self.room.id)
+        self.assertEqual(room.last_message_id, message.id)
+        self.assertGreater(room.modified_time, before)
+
+        saved = append_messages(self.seller, [(self.room.id, 'b'), (self.room.id, 'c')])
+        after = ChatRoom.objects.get(id=self.room.id)
+        self.assertEqual(after.last_message_id, saved[-1].id)
+        self.assertEqual(saved[-1].content, 'c')
+        self.assertGreater(after.modified_time, room.modified_time)
+
+
+class ChatRoomSyncTest(TestCase):
+
+    def setUp(self):
+        self.seller = make_profile('seller')
+        self.buyer = make_profile('buyer')
+        self.rooms = [ChatRoom.objects.create(seller=self.seller, buyer=self.buyer) for _ in range(3)]
+
+    def send(self, room, sender, content='hi'):
+        return ChatMessage.objects.create(room=room, sender=sender, content=content, readers='')
+
+    def test_since_returns_only_rooms_with_newer_messages(self):
+        first = self.send(self.rooms[0], self.buyer)
+        self.send(self.rooms[1], self.buyer)
+        rooms, watermark = sync_rooms(self.seller, 0)
+        self.assertEqual([room.id for room in rooms], [self.rooms[0].id, self.rooms[1].id])
+
+        # watermark 이후 새 메시지가 없으면 빈 목록과 같은 watermark
+        self.assertEqual(sync_rooms(self.seller, watermark), ([], watermark))
+
+        latest = self.send(self.rooms[2], self.seller)
+        rooms, next_watermark = sync_rooms(self.seller, watermark)
+        self.assertEqual([room.id for room in rooms], [self.rooms[2].id])
+        self.assertEqual(next_watermark, latest.id)
+        self.assertGreater(next_watermark, first.id)
+
+    def test_unread_count_per_participant(self):
+        room = self.rooms[0]
+        for _ in range(3):
+            self.send(room, self.buyer)
+        self.send(room, self.seller)
+        room.refresh_from_db()
+        self.assertEqual(room.unread_count(self.seller.id), 4)
+        self.assertEqual(room.unread_count(self.buyer.id), 4)
+
+        mark_read(room, self.seller, 3)
+        mark_read(room, self.buyer, 4)
+        room.refresh_from_db()
+        self.assertEqual(room.unread_count(self.seller.id), 1)
+        self.assertEqual(room.unread_count(self.buyer.id), 0)
+
+        # 읽은 위치는 뒤로 가지 않는다
+        mark_read(room, self.seller, 1)
+        room.refresh_from_db()
+        self.assertEqual(room.unread_count(self.seller.id), 1)
+
+
+class ReadCountBufferTest(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(read_counter, 'increment_read_count')
+        self.increment_read_count = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_flush_sends_one_update_per_product(self):
+        buffer = read_counter.ReadCountBuffer(interval=60)
+        buffer._start = mock.Mock()
+        for product_id in (1, 2, 1, 1):
+            buffer.increment(product_id)
+        self.assertFalse(self.increment_read_count.called)
+
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(sorted(self.increment_read_count.call_args_list), [mock.call(1, 3), mock.call(2, 1)])
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_failed_flush_keeps_remaining_counts(self):
+        buffer = read_counter.ReadCountBuffer(interval=60)
+        buffer._start = mock.Mock()
+        buffer.increment(1, 3)
+        buffer.increment(2, 1)
+        self.increment_read_count.side_effect = [None, RuntimeError('db down')]
+        with self.assertRaises(RuntimeError):
+            buffer.flush()
+        # 실패한 상품의 조회수는 그 사이 들어온 조회수와 합쳐진다
+        buffer.increment(2, 4)
+        self.increment_read_count.side_effect = None
+        self.increment_read_count.reset_mock()
+        self.assertEqual(buffer.flush(), 1)
+        self.increment_read_count.assert_called_once_with(2, 5)
+
+    def test_zero_interval_flushes_synchronously(self):
+        buffer = read_counter.ReadCountBuffer(interval=0)
+        buffer.increment(1)
+        buffer.increment(1)
+        self.assertIsNone(buffer._thread)
+        self.assertEqual(self.increment_read_count.call_args_list, [mock.call(1, 1), mock.call(1, 1)])
+
+    def test_negative_interval_is_rejected(self):
+        with self.assertRaises(ValueError):
+            read_counter.ReadCountBuffer(interval=-1)
+
+
+def local_cache(location):
+    return override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': location,
+    }})
+
+
+class ProductDetailCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        settings_patch = local_cache('product-detail-test')
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+        self.cache = ProductDetailCache(alias='default', ttl=60)
+        self.cache.cache.clear()
+
+    def test_concurrent_misses_build_once(self):
+        builds = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.1)
+            return {'id': 1}
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda i: self.cache.get_or_build(1, build), range(8)))
+        self.assertEqual(results, [{'id': 1}] * 8)
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(self.cache.stats(), {'hits': 7, 'misses': 1, 'hit_rate': 7 / 8})
+
+    def test_missing_product_is_not_cached(self):
+        self.assertIsNone(self.cache.get_or_build(1, lambda: None))
+        self.assertEqual(self.cache.get_or_build(1, lambda: {'id': 1}), {'id': 1})
+        self.cache.invalidate(1)
+        self.assertEqual(self.cache.get_or_build(1, lambda: {'id': 2}), {'id': 2})
+
+
+class GeocodeCacheTest(SimpleTestCase):
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = GeocodeCache(maxsize=2, ttl=60, alias=None)
+        cache.set('a', {'sgg_nm': 'a'})
+        cache.set('b', {'sgg_nm': 'b'})
+        self.assertIsNotNone(cache.get('a'))
+        cache.set('c', {'sgg_nm': 'c'})
+        # b 가 가장 오래 안 쓰였으므로 빠진다
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats()['size'], 2)
+
+    def test_expired_entry_is_a_miss(self):
+        cache = GeocodeCache(maxsize=10, ttl=60, alias=None)
+        with mock.patch('time.time', return_value=1000):
+            cache.set('a', {'sgg_nm': 'a'})
+            self.assertIsNotNone(cache.get('a'))
+        with mock.patch('time.time', return_value=1061):
+            self.assertIsNone(cache.get('a'))
+        stats = cache.stats()
+        self.assertEqual((stats['size'], stats['hits'], stats['misses']), (0, 1, 1))
+
+    def test_shared_cache_refills_local_entry(self):
+        with local_cache('geocode-test'):
+            cache = GeocodeCache(maxsize=10, ttl=60, alias='default')
+            cache.set('a', {'sgg_nm': 'a'})
+            cache.clear()
+            self.assertEqual(cache.get('a'), {'sgg_nm': 'a'})
+            self.assertEqual(cache.get('a'), {'sgg_nm': 'a'})
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['shared_hits']), (1, 1))
+
+
+class RoomMessageIdsSerializer(Serializer):
+    id = IntegerField()
+    messages = SerializerMethodField()
+
+    def get_messages(self, obj):
+        return [message.id for message in obj.chat_messages.all()]
+
+
+class StreamResponseTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.room_ids = []
+        for i in range(20):
+            room = ChatRoom.objects.create()
+            ChatMessage.objects.create(room=room, content='a', readers='')
+            ChatMessage.objects.create(room=room, content='b', readers='')
+            cls.room_ids.append(room.id)
+
+    def stream(self, size, chunk_size=200):
+        queryset = ChatRoom.objects.filter(id__in=self.room_ids[:size]).order_by('id') \
+            .prefetch_related('chat_messages')
+        request = Request(APIRequestFactory().get('/'))
+        response = stream_response(request, queryset, RoomMessageIdsSerializer, chunk_size=chunk_size)
+        return json.loads(b''.join(response.streaming_content))['payload']
+
+    def test_prefetch_is_applied_per_chunk(self):
+        assert_constant_query_count(self.stream, sizes=(1, 20))
+
+    def test_chunks_cover_every_row_with_its_prefetched_rows(self):
+        with CaptureQueriesContext(connection) as captured:
+            payload = self.stream(20, chunk_size=6)
+        self.assertEqual([row['id'] for row in payload], self.room_ids)
+        self.assertTrue(all(len(row['messages']) == 2 for row in payload))
+        # 본 쿼리 1번 + chunk 4개마다 prefetch 1번
+        self.assertEqual(len(captured), 1 + 4)
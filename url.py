@@ -21,13 +21,18 @@ include_doc_urlpatterns = [
     path('product_attach/<int:product_id>/', views.ProductImageView.as_view()),
     path('product/complete/<int:product_id>/', views.TransactionView.as_view()),
     path('location/', views.AreaView.as_view(),name = 'location'),
+    path('location/bulk/', views.BulkAreaView.as_view()),
     path('app_info/', views.AppInfoView.as_view()),
     path('term_agreement/', views.TermsAgreeView.as_view()),
     path('friends/', views.FriendView.as_view()),
+    path('friends/suggest/', views.FriendSuggestionView.as_view()),
+    path('friends/check/', views.FriendCheckView.as_view()),
     path('review/check/<int:profile_id>/', views.CheckReviewView.as_view()),
     path('review/<int:profile_id>/', views.ReviewView.as_view()),
     path('chat/', views.ChatRoomView.as_view()),
+    path('chat/batch/', views.ChatBatchView.as_view()),
     path('chat/<int:room_id>/', views.ChatView.as_view()),
+    path('chat/<int:room_id>/stream/', views.ChatStreamView.as_view()),
     path('profile/<int:profile_id>/', views.ProfileView.as_view()),
     path('share/product/<int:product_id>/', views.ShareProductView.as_view()),
     path('recommend/<int:profile_id>/', views.RecommendView.as_view()),
@@ -41,6 +46,7 @@ include_doc_urlpatterns = [
 ]
 
 exclude_doc_url_patterns = [
+    path('cache_stats/', views.CacheStatsView.as_view()),
 ]
 
 urlpatterns = include_doc_urlpatterns + exclude_doc_url_patterns
@@ -1,23 +1,48 @@
-import ast
-from uuid import uuid4
+import logging
+import os
+import queue
+import time
 
+import requests
 from django.conf import settings
-from django.db import transaction
-from django.db.models import Q, F
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
+from django.db.models import Q, F, Max, Count
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
+from rest_framework.settings import api_settings
 from rest_framework import viewsets
 from .models import ProductImage, Product, Profile, DeletedProfile, RelationShip, Transaction, Area, TempProfile, \
-    RelationShip, ChatRoom, ChatMessage, Recommend, Evaluation, Comment, Report, Notice
-from .serializers import ProductSerializers, ProfileSerializer, TransactionSerializer, \
+    RelationShip, ChatRoom, ChatMessage, Recommend, Evaluation, Comment, Report, Notice, ReachableSeller
+from .serializers import ProductSerializers, ProductFeedSerializer, ProfileSerializer, TransactionSerializer, \
     ChatRoomSerializer, ChatMessageSerializer, NoticeSerializer
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
-from .response_handler import CommonResponse, custom_paginator, ResponseConstants
-from .location import location
+from .response_handler import CommonResponse, cursor_paginator, stream_response, \
+    ResponseConstants, make_etag, not_modified
+from .geocode_cache import cached_location, geocode_cache
+from .area_registry import area_registry
+from .bulk_location import bulk_update_locations
+from .social_graph import get_graph
+from .contact_sync import parse_list, sync_contacts
+from .phone_index import phone_index
+from .chat_broker import broker, message_payload
+from .chat_sync import rooms_of, sync_rooms, mark_read, room_participants, append_messages, CHAT_BATCH_MAX
+from .renderers import CommonJSONRenderer, EventStreamRenderer, dumps
+from . import counters  # noqa: F401  카운터 signal 등록
+from .read_counter import read_count_buffer
+from .product_cache import product_detail_cache
+from .chat_archive import archive_paginator, archived_until, read_archived
 from django.contrib.auth.models import User
 
 
+# 이후 클라이언트가 since 로 재접속. sync WSGI 워커(gunicorn sync 등)는 스트림 하나당 최대 이 시간 동안 묶인다
+# 동시 스트림 수만큼 워커/스레드가 필요하므로 gthread/gevent 워커나 ASGI 로 띄우는 것을 권장
+CHAT_STREAM_TIMEOUT = getattr(settings, 'CHAT_STREAM_TIMEOUT', 60 * 5)
+CHAT_STREAM_HEARTBEAT = 15
+
+logger = logging.getLogger(__name__)
+
 # Create your views here.
 
 
@@ -25,8 +50,17 @@ class Me(APIView):
     permission_classes = (IsAuthenticated,)
 
     def get(self, request):
-        serializer = ProfileSerializer(request.user.profile)
-        return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, serializer.data)
+        profile = request.user.profile
+        # 카운터는 queryset.update() 로, friends 는 RelationShip bulk_create 로 바뀌어서 modified_time 에 반영되지 않는다
+        friends = RelationShip.objects.filter(subject=profile).aggregate(count=Count('id'), last_id=Max('id'))
+        etag = make_etag('me', request.get_full_path(), profile.id, profile.modified_time, profile.recommend_count,
+                         profile.score, friends['count'], friends['last_id'])
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        serializer = ProfileSerializer(profile, context={'request': request})
+        return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, serializer.data,
+                              etag=etag)
 
     def put(self, request):
         profile = request.user.profile
@@ -51,18 +85,22 @@ class Me(APIView):
         )
         del_profile.save()
 
+        # score 는 review_count/score_sum 과 함께 counters.py 가 유지하므로 여기서 지우지 않는다
         profile.name = None
-        profile.score = 0
         profile.fcm_token = None
         profile.app_version = None
         profile.platform = None
         profile.image = None
         profile.is_app_user = False
         profile.is_del = True
+        update_fields = ['name', 'fcm_token', 'app_version', 'platform', 'image', 'is_app_user', 'is_del',
+                         'modified_time']
 
-        if not RelationShip.objects.filter(object=profile).count() > 0:
+        if not RelationShip.objects.filter(object=profile).exists():
             profile.phone_number = None
-        profile.save()
+            update_fields.append('phone_number')
+        # 카운터 컬럼을 옛 값으로 덮어쓰지 않도록 바꾼 컬럼만 저장
+        profile.save(update_fields=update_fields)
         return CommonResponse(status.HTTP_204_NO_CONTENT, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, {})
 
 
@@ -71,9 +109,9 @@ class ProfileView(APIView):
 
     def get(self, request, profile_id):
         try:
-            profile = Profile.objects.get(id=profile_id)
+            profile = ProfileSerializer.setup_eager_loading(Profile.objects.all(), request).get(id=profile_id)
             return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE,
-                                  ProfileSerializer(profile))
+                                  ProfileSerializer(profile, context={'request': request}).data)
         except Profile.DoesNotExist as e:
             return CommonResponse(status.HTTP_404_NOT_FOUND, 'profile_id has not found', {})
 
@@ -91,12 +129,32 @@ class ProductView(APIView):
         return CommonResponse(status.HTTP_400_BAD_REQUEST, serializer.errors['error'], {})
 
     def get(self, request, product_id):
-        try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist as e:
+        if request.query_params.get('fields') or request.query_params.get('expand'):
+            # 일부 필드만 요청한 경우 캐시를 거치지 않고 필요한 컬럼만 조회
+            try:
+                product = ProductSerializers.sparse_queryset(Product.objects.all(), request).get(id=product_id)
+            except Product.DoesNotExist as e:
+                return CommonResponse(status.HTTP_404_NOT_FOUND, ResponseConstants.DEFAULT_FAILED_MESSAGE, {})
+            read_count_buffer.increment(product_id)
+            serializer = ProductSerializers(product, context={'request': request})
+            return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, serializer.data)
+
+        def build():
+            try:
+                product = Product.objects.get(id=product_id)
+            except Product.DoesNotExist as e:
+                return None
+            return dict(ProductSerializers(product, context={'request': request}).data)
+
+        payload = product_detail_cache.get_or_build(product_id, build)
+        if payload is None:
             return CommonResponse(status.HTTP_404_NOT_FOUND, ResponseConstants.DEFAULT_FAILED_MESSAGE, {})
-        serializer = ProductSerializers(product, context={'request': request})
-        return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, serializer.data)
+        read_count_buffer.increment(product_id)
+        etag = make_etag('product', product_id, payload['modified_time'], payload['read_count'])
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, payload, etag=etag)
 
     def put(self, request, product_id):
         try:
@@ -164,31 +222,44 @@ class TransactionView(APIView):
 class AreaView(APIView):
     permission_classes = (AllowAny,)
 
-    # TODO: 이거는 바꿔야 합니다.
     def post(self, request):
         lng = request.data.get('lng')
         lat = request.data.get('lat')
         owner = request.data.get('owner')
-        owner_id = User.objects.get(username=owner).id
         try:
-            locate = location(lng, lat)
-            area, created = Area.objects.get_or_create(
-                code=locate['code'],
-                full_name=locate['full_name'][0],
-                unit1=locate['unit1'],
-                unit2=locate['unit2'],
-                unit3=locate['unit3'],
-                unit4=locate['unit4'],
-            )
+            lng, lat = float(lng), float(lat)
+        except (TypeError, ValueError) as e:
+            return CommonResponse(status.HTTP_400_BAD_REQUEST, 'lng and lat must be numbers', {})
+        try:
+            locate = cached_location(lng, lat)
+        except (requests.RequestException, ValueError) as e:
+            # SGIS timeout/연결 실패/잘못된 응답
+            logger.warning('location lookup failed for (%s, %s): %r', lng, lat, e)
+            return CommonResponse(status.HTTP_503_SERVICE_UNAVAILABLE, ResponseConstants.DEFAULT_FAILED_MESSAGE,
+                                  {'detail': '위치 정보를 가져오지 못했습니다.'})
+        if not isinstance(locate, dict):
+            return CommonResponse(status.HTTP_400_BAD_REQUEST, ResponseConstants.DEFAULT_FAILED_MESSAGE,
+                                  {'detail': '존재하지않는 지역입니다.'})
+        try:
+            area = area_registry.resolve(locate)
         except KeyError as e:
             return CommonResponse(status.HTTP_400_BAD_REQUEST, ResponseConstants.DEFAULT_FAILED_MESSAGE,
-                                  {'존재하지않는 지역입니다.'})
-        else:
-            profile = Profile.objects.filter(owner=owner_id).values('area').update(
-                area=area
-            )
+                                  {'detail': '존재하지않는 지역입니다.'})
+        if not Profile.objects.filter(owner__username=owner).update(area_id=area.id):
+            return CommonResponse(status.HTTP_404_NOT_FOUND, 'owner has not found', {})
+
+        return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, {})
 
-            return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, {})
+
+class BulkAreaView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def post(self, request):
+        items = request.data.get('items')
+        if not isinstance(items, list):
+            return CommonResponse(status.HTTP_400_BAD_REQUEST, 'items is essential field', {})
+        stats = bulk_update_locations(items)
+        return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, stats)
 
 
 class AppInfoView(APIView):
@@ -227,47 +298,39 @@ class FriendView(APIView):
 
     def post(self, request):
         subject = request.user.profile  # 나자신
-        phone_num = request.data.get('phone_num')  # 친구번호
-        name = request.data.get('name')  # 친구이름
-        phonelist = ast.literal_eval(phone_num)  # 친구번호 리스트
-        namelist = ast.literal_eval(name)  # 친구이름 리스트
-        user_list = []  # bulk_create 하기위한 리스트
-        uid_list = []  # user가 저장을해야지 객체가 생겨서 uid는 계속 바뀌어서 uid를 저장하기위해 만들었습니다.
-        phone_list = []  # bulk_create 하기위한 리스트
-        relate_list = []  # bulk_create하기위한 리스
-        owner_list = []
-        for i in range(len(phonelist)):  # 먼저 객체를 생성해야됨
-            username = uuid4()
-            user = User(
-                username=username
-            )
-            user_list.append(user)
-            uid_list.append(username)
-        User.objects.bulk_create(user_list)
-        owner = User.objects.filter(username__in=uid_list)
-        for owner_id, number in zip(owner, phonelist):
-            profile = Profile(
-                owner=owner_id,
-                phone_number=number
-            )
-            phone_list.append(profile)
-            owner_list.append(owner_id)
-        Profile.objects.bulk_create(phone_list)
-        object = Profile.objects.filter(owner__in=owner_list).values('id')
-        for Name, object_id in zip(namelist, object):
-            relate = RelationShip(
-                subject_id=subject,
-                object_name=Name,
-                object_id=object_id['id']
-            )
-            relate_list.append(relate)
-        RelationShip.objects.bulk_create(relate_list)
-        return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, {})
+        phonelist = parse_list(request.data.get('phone_num'))  # 친구번호 리스트
+        namelist = parse_list(request.data.get('name'))  # 친구이름 리스트
+        if len(phonelist) != len(namelist):
+            return CommonResponse(status.HTTP_400_BAD_REQUEST, 'phone_num and name must have same length', {})
+        result = sync_contacts(subject, phonelist, namelist)
+        return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, result)
 
     def get(self, request):
         subject = request.user.profile
-        queryset = subject.friends.filter(is_app_user=1)
-        result = ProfileSerializer(queryset, many=True).data
+        queryset = ProfileSerializer.setup_eager_loading(subject.friends.filter(is_app_user=1), request)
+        result = ProfileSerializer(queryset, many=True, context={'request': request}).data
+        return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, result)
+
+
+class FriendCheckView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        # 연락처 중 앱 사용자인 번호만 돌려준다
+        numbers = parse_list(request.data.get('phone_num'))
+        result = phone_index.app_users_among(numbers)
+        return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, result)
+
+
+class FriendSuggestionView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        profile_ids = get_graph().suggest_friends(request.user.profile.id)
+        queryset = ProfileSerializer.setup_eager_loading(Profile.objects.filter(id__in=profile_ids), request)
+        profiles = {p.id: p for p in queryset}
+        queryset = [profiles[i] for i in profile_ids if i in profiles]
+        result = ProfileSerializer(queryset, many=True, context={'request': request}).data
         return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, result)
 
 
@@ -300,6 +363,7 @@ class TermsAgreeView(APIView):
 class ChatRoomView(APIView):
     permission_classes = (IsAuthenticated,)
 
+    @transaction.atomic
     def post(self, request):
         serializer = ChatRoomSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
@@ -310,25 +374,146 @@ class ChatRoomView(APIView):
 
     def get(self, request):
         profile = request.user.profile
-        queryset = ChatRoom.objects.select_related('seller', 'buyer', 'product'). \
-            filter(Q(seller=profile) | Q(buyer=profile)).order_by('-created_time')
+        since = request.query_params.get('since')
+        if since is not None:
+            # 증분 동기화: since 이후 새 메시지가 온 방과 unread 수, 다음 watermark
+            try:
+                rooms, watermark = sync_rooms(profile, int(since))
+            except ValueError:
+                return CommonResponse(status.HTTP_400_BAD_REQUEST, 'since is invalid', {})
+            result = {
+                'watermark': watermark,
+                'results': ChatRoomSerializer(rooms, many=True, context={'request': request}).data
+            }
+            return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, result)
 
-        return custom_paginator(request, queryset, ChatRoomSerializer)
+        queryset = ChatRoomSerializer.sparse_queryset(rooms_of(profile), request)
+        if ChatRoomSerializer.wants(request, 'last_message'):
+            queryset = queryset.select_related('last_message')
+        return cursor_paginator(request, queryset, ChatRoomSerializer)
 
 
 class ChatView(APIView):
 
     def get(self, request, room_id):
-        messages = ChatMessage.objects.filter(room_id=room_id).order_by('created_time')
-        return custom_paginator(request, messages, ChatMessageSerializer)
+        # 오래된 메시지는 아카이브 파일에서 이어서 읽는다
+        return archive_paginator(request, room_id, ChatMessageSerializer)
 
     def post(self, request, room_id):
         serializer = ChatMessageSerializer(data=request.data, context={'request': request, 'room_id': room_id})
         if serializer.is_valid():
-            return CommonResponse(status.HTTP_201_CREATED, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, {})
+            serializer.save()
+            return CommonResponse(status.HTTP_201_CREATED, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, serializer.data)
 
         return CommonResponse(status.HTTP_400_BAD_REQUEST, serializer.errors['error'], {})
 
+    def put(self, request, room_id):
+        # 읽음 처리: num 까지 읽었다고 기록
+        profile = request.user.profile
+        try:
+            room = rooms_of(profile).get(id=room_id)
+            num = mark_read(room, profile, request.data['num'])
+        except ChatRoom.DoesNotExist as e:
+            return CommonResponse(status.HTTP_404_NOT_FOUND, 'room_id does not exist', {})
+        except KeyError as e:
+            return CommonResponse(status.HTTP_400_BAD_REQUEST, f'{e} is essential field', {})
+        except (TypeError, ValueError) as e:
+            return CommonResponse(status.HTTP_400_BAD_REQUEST, 'num is invalid', {})
+        return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, {'num': num})
+
+
+class ChatBatchView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        # 오프라인 outbox flush: messages=[{"room": id, "content": "..."}, ...]
+        profile = request.user.profile
+        messages = request.data.get('messages')
+        if not isinstance(messages, list) or not messages:
+            return CommonResponse(status.HTTP_400_BAD_REQUEST, 'messages is essential field', {})
+        if len(messages) > CHAT_BATCH_MAX:
+            return CommonResponse(status.HTTP_400_BAD_REQUEST, f'messages can not exceed {CHAT_BATCH_MAX}', {})
+        items = []
+        for message in messages:
+            try:
+                room_id = int(message['room'])
+                content = message['content']
+            except (KeyError, TypeError, ValueError) as e:
+                return CommonResponse(status.HTTP_400_BAD_REQUEST, 'room and content are essential fields', {})
+            if not content:
+                return CommonResponse(status.HTTP_400_BAD_REQUEST, 'content is empty', {})
+            if not room_participants.is_member(room_id, profile.id):
+                return CommonResponse(status.HTTP_404_NOT_FOUND, f'room_id {room_id} does not exist', {})
+            items.append((room_id, content))
+        saved = append_messages(profile, items)
+        return CommonResponse(status.HTTP_201_CREATED, ResponseConstants.DEFAULT_SUCCESS_MESSAGE,
+                              ChatMessageSerializer(saved, many=True).data)
+
+
+class ChatStreamView(APIView):
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (EventStreamRenderer, CommonJSONRenderer)
+
+    def get(self, request, room_id):
+        profile = request.user.profile
+        room = ChatRoom.objects.filter(Q(seller=profile) | Q(buyer=profile), id=room_id) \
+            .only('id', 'last_message_id').first()
+        if room is None:
+            return CommonResponse(status.HTTP_404_NOT_FOUND, 'room_id does not exist', {})
+        # 처음 접속은 지금부터만 받는다. 이전 대화는 ChatView.get 으로 페이지 단위로 읽는다
+        since = request.query_params.get('since') or request.META.get('HTTP_LAST_EVENT_ID') \
+            or room.last_message_id or 0
+        try:
+            since = int(since)
+        except ValueError:
+            return CommonResponse(status.HTTP_400_BAD_REQUEST, 'since is invalid', {})
+
+        # 구독을 먼저 걸고 빠진 메시지를 조회해야 그 사이에 온 메시지를 놓치지 않는다
+        subscription = broker.subscribe(room_id)
+        limit = api_settings.PAGE_SIZE
+        gap = []
+        if since < archived_until(room_id):
+            gap = read_archived(room_id, since, limit + 1)
+        if len(gap) <= limit:
+            after_id = gap[-1].id if gap else since
+            gap += list(ChatMessage.objects.filter(room_id=room_id, id__gt=after_id)
+                        .order_by('id')[:limit + 1 - len(gap)])
+        # 빠진 메시지가 한 페이지보다 많으면 한 페이지만 보내고 끊는다. 클라이언트는 Last-Event-ID 로 이어 받는다
+        truncated = len(gap) > limit
+        gap = [message_payload(message) for message in gap[:limit]]
+        # 스트림이 열려 있는 동안 DB 커넥션을 잡고 있지 않는다
+        connection.close()
+
+        def event(message):
+            return b'id: %d\nevent: message\ndata: %s\n\n' % (message['id'], dumps(message))
+
+        def generate():
+            last_id = since
+            deadline = time.time() + CHAT_STREAM_TIMEOUT
+            try:
+                for message in gap:
+                    last_id = message['id']
+                    yield event(message)
+                if truncated:
+                    yield b'retry: 0\n\n'
+                    return
+                while time.time() < deadline:
+                    try:
+                        message = subscription.get(timeout=CHAT_STREAM_HEARTBEAT)
+                    except queue.Empty:
+                        yield b': keep-alive\n\n'
+                        continue
+                    if message['id'] > last_id:
+                        last_id = message['id']
+                        yield event(message)
+            finally:
+                broker.unsubscribe(room_id, subscription)
+
+        response = StreamingHttpResponse(generate(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
 
 class ShareProductView(APIView):
     permission_classes = (IsAuthenticated,)
@@ -350,6 +535,7 @@ class ShareProductView(APIView):
 class RecommendView(APIView):
     permission_classes = (IsAuthenticated,)
 
+    @transaction.atomic
     def post(self, request, profile_id):
         try:
             subject = request.user.profile
@@ -368,7 +554,7 @@ class SellHistory(APIView):
 
     def get(self, request):
         queryset = Transaction.objects.filter(seller=request.user.profile)
-        return custom_paginator(request, queryset, TransactionSerializer)
+        return cursor_paginator(request, queryset, TransactionSerializer)
 
     def delete(self, request, transaction_id):
         profile = request.user.profile
@@ -385,7 +571,7 @@ class BuyHistory(APIView):
 
     def get(self, request):
         queryset = Transaction.objects.filter(buyer=request.user.profile)
-        return custom_paginator(request, queryset, TransactionSerializer)
+        return cursor_paginator(request, queryset, TransactionSerializer)
 
     def delete(self, request, transaction_id):
         profile = request.user.profile
@@ -414,11 +600,13 @@ class CheckReviewView(APIView):
 class ReviewView(APIView):
     permission_classes = (IsAuthenticated,)
 
+    @transaction.atomic
     def post(self, request, profile_id):
         data = request.data
         try:
             object = Profile.objects.get(id=profile_id)
             eval = Evaluation(subject=request.user.profile, object=object, score=data['score'])
+            eval.save()
 
             content = data.get('content')
             if content:
@@ -426,7 +614,6 @@ class ReviewView(APIView):
                     evaluation=eval,
                     content=content
                 ).save()
-            eval.save()
         except Profile.DoesNotExist as e:
             return CommonResponse(status.HTTP_404_NOT_FOUND, 'profile has not found', {})
         except KeyError as e:
@@ -453,55 +640,27 @@ class ReportView(APIView):
             return CommonResponse(status.HTTP_404_NOT_FOUND, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, {})
 
 
+def product_feed_response(request, products):
+    # ?stream=1 이면 전체 피드를 chunk 단위로 스트리밍, 아니면 modified_time 커서 페이지네이션
+    # ?fields= / ?expand=seller 로 필요한 필드만 직렬화하고 SELECT 컬럼도 줄인다
+    products = ProductFeedSerializer.setup_queryset(products, request)
+    if request.query_params.get('stream'):
+        return stream_response(request, products.order_by('-modified_time', '-id'), ProductFeedSerializer)
+    return cursor_paginator(request, products, ProductFeedSerializer, field='modified_time',
+                            version=ProductFeedSerializer.versioner(request))
+
+
 class ProductOfFriendsView(APIView):
     permission_classes = (IsAuthenticated,)
 
     def get(self, request):
-        # profile = request.user.profile
-        profile = Profile.objects.get(id=6)
-
-        friends = []
-        # 1->2 step
-        active_object_id_list = list(RelationShip.objects.select_related('object') \
-                                     .filter(subject=profile, object__is_app_user=True) \
-                                     .values_list('object_id', flat=True))
-        inactive_object_id_list = list(RelationShip.objects.select_related('object') \
-                                       .filter(subject=profile, object__is_app_user=False) \
-                                       .values_list('object_id', flat=True))
-
-        friends.extend(active_object_id_list)
-
-        # 2->3 step
-        object_id_list = list(RelationShip.objects.select_related('object') \
-                              .filter(subject_id__in=active_object_id_list, object__is_app_user=True) \
-                              .exclude(object_id=profile.id) \
-                              .values_list('object_id', flat=True))
-
-        friends.extend(object_id_list)
-
-        object_id_list = list(RelationShip.objects.select_related('subject') \
-                              .filter(object_id__in=inactive_object_id_list) \
-                              .exclude(subject_id=profile.id) \
-                              .values_list('object_id', flat=True))
-
-        friends.extend(object_id_list)
-
-        # 3->4 step
-        object_id_list = list(RelationShip.objects.select_related('object') \
-                              .filter(subject_id__in=object_id_list, object__is_app_user=True) \
-                              .values_list('object_id', flat=True))
-
-        friends.extend(object_id_list)
-
-        friends = list(set(friends))
+        profile = request.user.profile
+        # 친구의 친구까지의 판매자는 ReachableSeller 에 미리 계산되어 있다
+        sellers = ReachableSeller.objects.filter(profile=profile).values('seller_id')
 
-        products = Product.objects.select_related('seller', 'category') \
-            .filter(seller_id__in=friends) \
-            .prefetch_related('product_images') \
-            .order_by('-modified_time')
+        products = Product.objects.filter(seller_id__in=sellers)
 
-        return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE,
-                              ProductSerializers(products, many=True).data)
+        return product_feed_response(request, products)
 
 
 class ProductOfLocationView(APIView):
@@ -512,13 +671,22 @@ class ProductOfLocationView(APIView):
         area = profile.area
         if not area:
             return CommonResponse(status.HTTP_202_ACCEPTED, 'user location info empty', {})
-        products = Product.objects.select_related('area', 'seller', 'category', 'start_baby_age', 'end_baby_age') \
-            .filter(area__unit1=area.unit1, area__unit2=area.unit2, area__unit3=area.unit3) \
-            .prefetch_related('product_images') \
-            .order_by('-modified_time')
+        products = Product.objects.filter(area__unit1=area.unit1, area__unit2=area.unit2, area__unit3=area.unit3)
 
-        return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE,
-                              ProductSerializers(products, many=True).data)
+        return product_feed_response(request, products)
+
+
+class CacheStatsView(APIView):
+    # 캐시 적중률은 프로세스(워커)마다 따로 세므로 pid 와 함께 돌려준다
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        stats = {
+            'pid': os.getpid(),
+            'product_detail': product_detail_cache.stats(),
+            'geocode': geocode_cache.stats(),
+        }
+        return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE, stats)
 
 
 class NoticeViewSet(viewsets.ReadOnlyModelViewSet):
@@ -527,10 +695,15 @@ class NoticeViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Notice.objects.all()
 
     def list(self, request, *args, **kwargs):
+        version = self.queryset.aggregate(last_modified=Max('modified_time'), count=Count('id'))
+        etag = make_etag('notice', request.get_full_path(), version['last_modified'], version['count'])
+        response = not_modified(request, etag, version['last_modified'])
+        if response is not None:
+            return response
         data = self.get_serializer(self.paginate_queryset(self.queryset), many=True).data
         response = self.get_paginated_response(data)
         return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE,
-                              response.data)
+                              response.data, etag=etag, last_modified=version['last_modified'])
 
     def retrieve(self, request, *args, **kwargs):
         return CommonResponse(status.HTTP_200_OK, ResponseConstants.DEFAULT_SUCCESS_MESSAGE,